@@ -1,15 +1,45 @@
 import numpy as np
-from random import random, randint
 from collections import deque
 
-from q_network import QNetwork 
-from memory import ReplayMemory
+from memory import ReplayMemory, PrioritizedReplayMemory, MappedReplayMemory, CompactReplayMemory, TrajectoryReplayMemory
+from profiler import Profiler
+
+
+def double_dqn_targets(target, target_next, target_val, actions, rewards, dones, gamma):
+    """
+    Replaces the action-values of the taken actions by their Double DQN targets, in place.
+    Same result, element by element, as the per-sample Bellman update in the dtypes of the inputs.
+
+    :param target: action-values of the states using the local network.
+    :type target: NumPy array with dimension (N, 4).
+    :param target_next: action-values of the next states using the local network, to select the actions.
+    :type target_next: NumPy array with dimension (N, 4).
+    :param target_val: action-values of the next states using the target network, to evaluate the actions.
+    :type target_val: NumPy array with dimension (N, 4).
+    :param actions: actions taken.
+    :type actions: NumPy int array with dimension (N,).
+    :param rewards: rewards received.
+    :type rewards: NumPy array with dimension (N,).
+    :param dones: if the episodes ended.
+    :type dones: NumPy boolean array with dimension (N,).
+    :param gamma: discount factor.
+    :type gamma: float.
+    :return: TD errors of the taken actions.
+    :rtype: NumPy array with dimension (N,).
+    """
+    rows = np.arange(len(target))
+    max_action_values = np.argmax(target_next, axis=1)   #action selection
+    new_values = np.where(dones, rewards, rewards + gamma*target_val[rows, max_action_values])   #action evaluation
+    td_errors = new_values - target[rows, actions]
+    target[rows, actions] = new_values
+    return td_errors
+
 
 class DeepQ_agent:
     """
     Represents the DQN agent.
     """
-    def __init__(self, env, hidden_units = None, network_LR=0.01, batch_size=1024, update_every=5, gamma=0.95):
+    def __init__(self, env, hidden_units = None, network_LR=0.01, batch_size=1024, update_every=5, gamma=0.95, backend='keras', prioritized=False, memory_capacity=int(1e5), memory_path=None, compact_memory=False, trajectory_memory=False, seed=None, profiler=None):
         """
         Creates a DQN agent.
 
@@ -25,27 +55,72 @@ class DeepQ_agent:
         :type update_every: int
         :param gamma: discount factor.
         :type gamma: float.
+        :param backend: 'keras' to train, or 'numpy' to only play without importing Keras.
+        :type backend: str.
+        :param prioritized: if experiences are replayed proportionally to their TD error.
+            At most one of prioritized, memory_path, compact_memory and trajectory_memory can be set.
+        :type prioritized: boolean.
+        :param memory_capacity: size of the experience replay buffer.
+        :type memory_capacity: int.
+        :param memory_path: directory where the replay buffer is kept on disk, in RAM if None. Not with the other memory options.
+        :type memory_path: str.
+        :param compact_memory: if the replay buffer stores the states packed in 18 bytes. Not with the other memory options.
+        :type compact_memory: boolean.
+        :param trajectory_memory: if the replay buffer stores each observation once, in episode order. Not with the other memory options.
+        :type trajectory_memory: boolean.
+        :param seed: seed of the exploration, the initial weights and the replay sampling, or a numpy.random.SeedSequence.
+        :type seed: int.
+        :param profiler: timers of the phases of learn(), disabled if None.
+        :type profiler: Class Profiler().
+        :raises ValueError: if more than one memory option is set.
         """
+        memory_options = {'prioritized': prioritized, 'memory_path': memory_path is not None,
+                          'compact_memory': compact_memory, 'trajectory_memory': trajectory_memory}
+        chosen = [name for name, value in memory_options.items() if value]
+        if len(chosen) > 1:
+            raise ValueError('Only one memory option can be set, got {}.'.format(', '.join(chosen)))
+
         self.env = env
         self.BATCH_SIZE = batch_size
         self.GAMMA = gamma          
         self.NETWORK_LR = network_LR
-        self.MEMORY_CAPACITY = int(1e5)   
+        self.MEMORY_CAPACITY = memory_capacity
         self.ACTION_SIZE = env.ACTION_SPACE           
         self.HIDDEN_UNITS = hidden_units
         self.UPDATE_EVERY = update_every
+        self.PRIORITIZED = prioritized
+        self.rng = np.random.default_rng(seed)
+        self.profiler = profiler if profiler is not None else Profiler()
+        local_seed, target_seed = (int(s) for s in self.rng.integers(2**31 - 4, size=2))   #4 layers, see QNetwork.make_model()
+        memory_rng = np.random.default_rng(self.rng.integers(2**63))
+
+        if backend == 'numpy':
+            from numpy_network import NumpyQNetwork as QNetwork
+        else:
+            from q_network import QNetwork
        
         self.qnetwork_local = QNetwork(input_shape = self.env.STATE_SPACE,
                                         hidden_units = self.HIDDEN_UNITS,
                                         output_size = self.ACTION_SIZE,
-                                        learning_rate = self.NETWORK_LR)
+                                        learning_rate = self.NETWORK_LR,
+                                        seed = local_seed)
         
         self.qnetwork_target = QNetwork(input_shape = self.env.STATE_SPACE,
                                         hidden_units = self.HIDDEN_UNITS,
                                         output_size = self.ACTION_SIZE,
-                                        learning_rate = self.NETWORK_LR)
+                                        learning_rate = self.NETWORK_LR,
+                                        seed = target_seed)
 
-        self.memory = ReplayMemory(self.MEMORY_CAPACITY, self.BATCH_SIZE) 
+        if prioritized:
+            self.memory = PrioritizedReplayMemory(self.MEMORY_CAPACITY, self.BATCH_SIZE, rng=memory_rng)
+        elif memory_path is not None:
+            self.memory = MappedReplayMemory(memory_path, self.MEMORY_CAPACITY, self.BATCH_SIZE, rng=memory_rng)
+        elif compact_memory:
+            self.memory = CompactReplayMemory(self.MEMORY_CAPACITY, self.BATCH_SIZE, rng=memory_rng)
+        elif trajectory_memory:
+            self.memory = TrajectoryReplayMemory(self.MEMORY_CAPACITY, self.BATCH_SIZE, rng=memory_rng)
+        else:
+            self.memory = ReplayMemory(self.MEMORY_CAPACITY, self.BATCH_SIZE, rng=memory_rng)
 
         #Temp variable
         self.t = 0
@@ -56,29 +131,36 @@ class DeepQ_agent:
         Learn from memorized experience.
         """
         if self.memory.__len__() > self.BATCH_SIZE:
+            profiler = self.profiler
+            profiler.count('learn_calls')
+            t = profiler.start()
             states, actions, rewards, next_states, dones = self.memory.sample(self.env.STATE_SPACE)
+            profiler.stop('learn.sample', t)
             
-            #Calculating action-values using local network
-            target = self.qnetwork_local.predict(states, self.BATCH_SIZE)
+            #Action-values of the states and future action-values using local network, in a single pass
+            t = profiler.start()
+            local_values = self.qnetwork_local.predict(np.concatenate((states, next_states)), 2*self.BATCH_SIZE)
+            target, target_next = local_values[:self.BATCH_SIZE], local_values[self.BATCH_SIZE:]
             
             #Future action-values using target network
             target_val = self.qnetwork_target.predict(next_states, self.BATCH_SIZE)
-            
-            #Future action-values using local network
-            target_next = self.qnetwork_local.predict(next_states, self.BATCH_SIZE)
+            profiler.stop('learn.predict', t)
         
-            max_action_values = np.argmax(target_next, axis=1)   #action selection
-            
-            for i in range(self.BATCH_SIZE):
-                if dones[i]:
-                    target[i][actions[i]] = rewards[i]
-                else:
-                    target[i][actions[i]] = rewards[i] + self.GAMMA*target_val[i][max_action_values[i]]   #action evaluation
-            
-            self.qnetwork_local.train(states, target, batch_size = self.BATCH_SIZE)
+            td_errors = double_dqn_targets(target, target_next, target_val, actions, rewards, dones, self.GAMMA)
+
+            t = profiler.start()
+            if self.PRIORITIZED:
+                self.memory.update_priorities(td_errors)
+                self.qnetwork_local.train(states, target, batch_size = self.BATCH_SIZE, sample_weights = self.memory.batch_weights)
+            else:
+                self.qnetwork_local.train(states, target, batch_size = self.BATCH_SIZE)
+            profiler.stop('learn.fit', t)
 
             if self.t == self.UPDATE_EVERY:
+                t = profiler.start()
                 self.update_target_weights()
+                profiler.stop('learn.target_sync', t)
+                profiler.count('target_updates')
                 self.t = 0
             else:
                 self.t += 1
@@ -95,15 +177,31 @@ class DeepQ_agent:
         :return action: action chosen by the agent.
         :rtype: int
         """    
-        state = state.reshape((1,)+state.shape)
-        action_values = self.qnetwork_local.predict(state)    #returns a vector of size = self.ACTION_SIZE
-        if random() > epsilon:
+        action_values = self.qnetwork_local.predict_numpy(state)    #returns a vector of size = self.ACTION_SIZE
+        if self.rng.random() > epsilon:
             action = np.argmax(action_values)                 #choose best action - Exploitation
         else:
-            action = randint(0, self.ACTION_SIZE-1)           #choose random action - Exploration
+            action = int(self.rng.integers(0, self.ACTION_SIZE))     #choose random action - Exploration
         return action
 
 
+    def act_batch(self, states, epsilon=0.0):
+        """
+        Chooses actions for many states at once using an epsilon-greedy policy.
+
+        :param states: current states, one per environment.
+        :type states: NumPy array with dimension (N, 18).
+        :param epsilon: epsilon used in epsilon-greedy policy.
+        :type epsilon: float
+        :return actions: actions chosen by the agent.
+        :rtype: NumPy int array with dimension (N,).
+        """
+        actions = np.argmax(self.qnetwork_local.predict_numpy(states), axis=1)   #choose best actions - Exploitation
+        explore = self.rng.random(len(actions)) <= epsilon
+        actions[explore] = self.rng.integers(0, self.ACTION_SIZE, size=np.count_nonzero(explore))   #random actions - Exploration
+        return actions
+
+
     def add_experience(self, state, action, reward, next_state, done):
         """
         Add experience to agent's memory.
@@ -115,4 +213,4 @@ class DeepQ_agent:
         """
         Updates values of the Target network.
         """
-        self.qnetwork_target.model.set_weights(self.qnetwork_local.model.get_weights())
\ No newline at end of file
+        self.qnetwork_target.set_weights(self.qnetwork_local.get_weights())
\ No newline at end of file
@@ -0,0 +1,408 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing as mp
+import numpy as np
+
+from memory import ReplayMemory, CompactReplayMemory, PrioritizedReplayMemory, TrajectoryReplayMemory, SharedReplayMemory
+
+
+#Benchmark settings
+MAX_SIZE = 27                       #maximum size of the environment, as in train.py
+BOARD_SIZES = (8, 16, 24)           #even sizes, so that the snake can follow a cycle through every cell and never die
+SNAKE_LENGTHS = (4, 32, 128)
+CAPACITIES = (int(1e4), int(1e5), int(1e6))
+MEMORIES = {'uniform': ReplayMemory, 'compact': CompactReplayMemory, 'prioritized': PrioritizedReplayMemory, 'trajectory': TrajectoryReplayMemory}
+BATCH_SIZES = (32, 64, 256, 1024)
+HIDDEN_UNITS = (32, 18, 10)
+THRESHOLD = 0.1                     #relative slowdown reported as a regression by compare
+
+#Move from one cell to the next one: 0:left, 1:right, 2:up, 3:down
+ACTIONS = {(-1, 0): 0, (1, 0): 1, (0, -1): 2, (0, 1): 3}
+
+
+def per_call(function, number, repeat=3):
+    """
+    Time of one call, the best of several runs like timeit.
+
+    :param function: function to be timed, without arguments.
+    :type function: callable.
+    :param number: calls in each run.
+    :type number: int.
+    :param repeat: number of runs.
+    :type repeat: int.
+    :return: seconds per call.
+    :rtype: float.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start)/number)
+    return best
+
+
+def machine_info():
+    """
+    Describes the machine and the versions of the libraries.
+
+    :rtype: dict.
+    """
+    return {'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def cycle(boundaries):
+    """
+    Cells of the board in an order that visits all of them and comes back to the first one.
+
+    :param boundaries: boundaries of the game, with an even height.
+    :type boundaries: tuple of int with dimension (1, 4).
+    :return: positions from the top left corner, first going right.
+    :rtype: list of (int, int).
+    """
+    x1, x2, y1, y2 = boundaries
+    cells = [(x, y1) for x in range(x1, x2+1)]                  #top row
+    for i, y in enumerate(range(y1+1, y2+1)):                   #other rows, without the first column
+        columns = range(x2, x1, -1) if i % 2 == 0 else range(x1+1, x2+1)
+        cells += [(x, y) for x in columns]
+    cells += [(x1, y) for y in range(y2, y1, -1)]               #back up the first column
+    return cells
+
+
+def snake_on_cycle(env, size, length):
+    """
+    Resets the environment with a snake of the given length that follows a cycle through the board.
+
+    :param env: game environment.
+    :type env: Class Snake_Env().
+    :param size: width and height of the game border.
+    :type size: int.
+    :param length: length of the snake.
+    :type length: int.
+    :return: the cycle and the position of the head on it.
+    :rtype: list of (int, int), int.
+    """
+    env.WIDTH = env.HEIGHT = size
+    x1, x2, y1, y2 = env.get_boundaries()
+    cells = cycle((x1, x2, y1, y2))
+    head_x, head_y = cells[3]
+    env.restore(size, size, head_x, head_y, 1, x1-1, y1-1)      #4 cells going right, the food out of reach keeps the length
+    for i in range(4, length):
+        env.SNAKE.eat_food(*cells[i])
+    env.VELOCITY = ACTIONS[(cells[length-1][0] - cells[length-2][0], cells[length-1][1] - cells[length-2][1])]
+    env.SNAKE.MOVES = 10**9      #no limit of moves
+    return cells, length-1
+
+
+def bench_env(size, length, num_steps=5000):
+    """
+    Measures env.step() and Snake.look() with a snake of a given length.
+
+    :param size: width and height of the game border.
+    :type size: int.
+    :param length: length of the snake.
+    :type length: int.
+    :param num_steps: number of steps.
+    :type num_steps: int.
+    :return: steps per second and microseconds per call to look().
+    :rtype: float, float.
+    """
+    from environment import Snake_Env
+
+    env = Snake_Env(MAX_SIZE, MAX_SIZE, size, size, 1, 1, seed=0)
+    cells, head = snake_on_cycle(env, size, length)
+    next_actions = [ACTIONS[(b[0] - a[0], b[1] - a[1])] for a, b in zip(cells, cells[1:] + cells[:1])]
+
+    steps_per_sec = 0
+    for _ in range(3):      #best of 3 runs, the snake keeps going around the cycle
+        start = time.perf_counter()
+        for _ in range(num_steps):
+            env.step(next_actions[head])
+            head = (head + 1) % len(cells)
+        steps_per_sec = max(steps_per_sec, num_steps/(time.perf_counter() - start))
+
+    boundaries = env.get_boundaries()
+    look = per_call(lambda: env.SNAKE.look(env.FOOD_X, env.FOOD_Y, boundaries), 2000)
+    return steps_per_sec, look*1e6
+
+
+def play_experiences(num_steps, seed=0):
+    """
+    Experiences of random games on the largest board, in the order an agent adds them to its memory.
+
+    :param num_steps: number of steps played.
+    :type num_steps: int.
+    :param seed: seed of the games and of the actions.
+    :type seed: int.
+    :return: state, action, reward, next state and done of each step.
+    :rtype: list of tuple.
+    """
+    from environment import Snake_Env
+
+    env = Snake_Env(MAX_SIZE, MAX_SIZE, MAX_SIZE-2, MAX_SIZE-2, 1, 1, seed=seed)
+    rng = np.random.default_rng(seed)
+    experiences = []
+    state = env.reset()
+    for _ in range(num_steps):
+        action = int(rng.integers(4))
+        next_state, reward, done, _ = env.step(action)
+        experiences.append((state, action, reward, next_state, done))
+        state = env.reset() if done else next_state
+    return experiences
+
+
+def bench_replay(kind, capacity, batch_size=64, num_adds=20000, num_samples=500):
+    """
+    Measures the throughput of adding one experience and of sampling a minibatch.
+
+    :param kind: key of MEMORIES.
+    :type kind: str.
+    :param capacity: size of the experience replay buffer.
+    :type capacity: int.
+    :param batch_size: size of the sampled minibatches.
+    :type batch_size: int.
+    :param num_adds: experiences added.
+    :type num_adds: int.
+    :param num_samples: minibatches sampled.
+    :type num_samples: int.
+    :return: adds per second and samples per second.
+    :rtype: float, float.
+    """
+    memory = MEMORIES[kind](capacity, batch_size, rng=np.random.default_rng(0))
+    experiences = play_experiences(1024)      #real states, so the compact memory packs what it packs in training
+
+    adds_per_sec = 0
+    for _ in range(3):      #best of 3 runs
+        start = time.perf_counter()
+        for i in range(num_adds):
+            memory.add(*experiences[i % 1024])
+        adds_per_sec = max(adds_per_sec, num_adds/(time.perf_counter() - start))
+
+    sample = per_call(lambda: memory.sample(18), num_samples)
+    return adds_per_sec, 1/sample
+
+
+def bench_agent(batch_sizes=BATCH_SIZES, train_steps=500):
+    """
+    Measures act() latency, learn() latency per batch size and the steps per second of the training loop of train.py.
+    Needs Keras.
+
+    :param batch_sizes: batch sizes of learn().
+    :type batch_sizes: tuple of int.
+    :param train_steps: steps of the training loop.
+    :type train_steps: int.
+    :return: act latency in microseconds, learn latency in milliseconds per batch size and training steps per second.
+    :rtype: float, dict, float.
+    """
+    from environment import Snake_Env
+    from agent import DeepQ_agent
+
+    env = Snake_Env(MAX_SIZE, MAX_SIZE, MAX_SIZE-2, MAX_SIZE-2, 1, 1, seed=0)
+    rng = np.random.default_rng(0)
+    act, learn = None, {}
+    for batch_size in batch_sizes:
+        agent = DeepQ_agent(env, hidden_units=HIDDEN_UNITS, batch_size=batch_size, seed=0)
+        for _ in range(2*batch_size):
+            agent.add_experience(rng.random(18), int(rng.integers(4)), -1.0, rng.random(18), False)
+        agent.learn()       #traces the compiled functions
+        learn[batch_size] = per_call(agent.learn, 20)*1e3
+        if act is None:
+            state = env.reset()
+            act = per_call(lambda: agent.act(state, 0.05), 2000)*1e6
+
+    #Training loop of train.py
+    agent = DeepQ_agent(env, hidden_units=HIDDEN_UNITS, batch_size=64, seed=0)
+    state = env.reset()
+    start = time.perf_counter()
+    for _ in range(train_steps):
+        action = agent.act(state, 0.05)
+        next_state, reward, done, _ = env.step(action)
+        agent.add_experience(state, action, reward, next_state, done)
+        agent.learn()
+        state = env.reset() if done else next_state
+    return act, learn, train_steps/(time.perf_counter() - start)
+
+
+def shared_replay_writer(memory, writer, num_adds, barrier, times):
+    """
+    Adds random experiences to a shared memory, one at a time like an actor does.
+    Only the adds are timed, from the moment all the writers are ready.
+
+    :param memory: shared replay memory.
+    :type memory: SharedReplayMemory.
+    :param writer: number of the writer.
+    :type writer: int.
+    :param num_adds: number of experiences to add.
+    :type num_adds: int.
+    :param barrier: all the writers start adding together.
+    :type barrier: multiprocessing.Barrier.
+    :param times: seconds taken by each writer.
+    :type times: multiprocessing.Array of float.
+    """
+    memory.set_writer(writer)
+    states = np.random.random((1024, memory.STATE_SIZE))
+    barrier.wait()
+    start = time.perf_counter()
+    for i in range(num_adds):
+        memory.add(states[i % 1024], i % 4, -1.0, states[(i+1) % 1024], False)
+    times[writer] = time.perf_counter() - start
+    memory.close()
+
+
+def bench_shared_replay(num_writers, num_adds=100000, buffer_size=int(1e5), batch_size=1024, num_samples=200):
+    """
+    Measures insert throughput of several writer processes and sample throughput of the learner.
+
+    :param num_writers: number of writer processes.
+    :type num_writers: int.
+    :param num_adds: experiences added by each writer.
+    :type num_adds: int.
+    :param buffer_size: size of the experience replay buffer.
+    :type buffer_size: int.
+    :param batch_size: size of the sampled minibatches.
+    :type batch_size: int.
+    :param num_samples: number of minibatches sampled.
+    :type num_samples: int.
+    :return: results of the benchmark.
+    :rtype: dict.
+    """
+    ctx = mp.get_context('spawn')
+    memory = SharedReplayMemory(buffer_size, batch_size, num_writers=num_writers)
+    barrier, times = ctx.Barrier(num_writers), ctx.Array('d', num_writers)
+    writers = [ctx.Process(target=shared_replay_writer, args=(memory, i, num_adds, barrier, times)) for i in range(num_writers)]
+
+    #The start of the processes is not timed, the inserts last until the slowest writer is done
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    insert_time = max(times)
+
+    start = time.perf_counter()
+    for _ in range(num_samples):
+        memory.sample(memory.STATE_SIZE)
+    sample_time = time.perf_counter() - start
+    memory.close()
+
+    return {'writers': num_writers,
+            'inserts_per_sec': num_writers*num_adds/insert_time,
+            'samples_per_sec': num_samples/sample_time,
+            'sampled_transitions_per_sec': num_samples*batch_size/sample_time}
+
+
+def run(agent=True, shared=True):
+    """
+    Runs the whole suite.
+
+    :param agent: if act(), learn() and the training loop are measured (imports Keras).
+    :type agent: boolean.
+    :param shared: if the shared replay memory is measured (starts processes).
+    :type shared: boolean.
+    :return: machine info and metrics, each one with its value, unit and if higher is better.
+    :rtype: dict.
+    """
+    metrics = {}
+
+    def record(name, value, unit, higher_is_better):
+        metrics[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+        print('{:<50} {:>14.2f} {}'.format(name, value, unit))
+
+    for size in BOARD_SIZES:
+        for length in SNAKE_LENGTHS:
+            if length <= size*size//2:
+                steps_per_sec, look = bench_env(size, length)
+                record('env.step/board={}/length={}'.format(size, length), steps_per_sec, 'steps/s', True)
+                record('snake.look/board={}/length={}'.format(size, length), look, 'us/call', False)
+
+    for kind in MEMORIES:
+        for capacity in CAPACITIES:
+            adds, samples = bench_replay(kind, capacity)
+            record('replay.add/{}/capacity={}'.format(kind, capacity), adds, 'adds/s', True)
+            record('replay.sample/{}/capacity={}'.format(kind, capacity), samples, 'samples/s', True)
+
+    if agent:
+        act, learn, train = bench_agent()
+        record('agent.act', act, 'us/call', False)
+        for batch_size, latency in learn.items():
+            record('agent.learn/batch={}'.format(batch_size), latency, 'ms/call', False)
+        record('train.loop', train, 'steps/s', True)
+
+    if shared:
+        for num_writers in (1, 4, 16):
+            result = bench_shared_replay(num_writers, num_adds=20000)
+            record('shared_replay.insert/writers={}'.format(num_writers), result['inserts_per_sec'], 'inserts/s', True)
+            record('shared_replay.sample/writers={}'.format(num_writers), result['samples_per_sec'], 'samples/s', True)
+
+    return {'machine': machine_info(), 'metrics': metrics}
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """
+    Compares two runs and prints the change of every metric.
+
+    :param baseline: results of run() used as reference.
+    :type baseline: dict.
+    :param current: results of run() to be checked.
+    :type current: dict.
+    :param threshold: relative slowdown reported as a regression.
+    :type threshold: float.
+    :return: names of the metrics that regressed.
+    :rtype: list of str.
+    """
+    regressions = []
+    for name, metric in current['metrics'].items():
+        if name not in baseline['metrics']:
+            continue
+        old, new = baseline['metrics'][name]['value'], metric['value']
+        speedup = new/old if metric['higher_is_better'] else old/new      #above 1 is faster
+        flag = ''
+        if speedup < 1 - threshold:
+            regressions.append(name)
+            flag = 'REGRESSION'
+        elif speedup > 1 + threshold:
+            flag = 'faster'
+        print('{:<50} {:>12.2f} {:>12.2f} {:>7.2f}x {}'.format(name, old, new, speedup, flag))
+
+    if baseline['machine'] != current['machine']:
+        different = [key for key in current['machine'] if key != 'time' and baseline['machine'].get(key) != current['machine'][key]]
+        if different:
+            print('Warning: the runs come from different machines or versions ({}).'.format(', '.join(different)))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the speed of the simulator, the replay memories and the agent.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the suite')
+    run_parser.add_argument('--output', help='JSON file for the results')
+    run_parser.add_argument('--no-agent', action='store_true', help='skip act/learn/training loop (no Keras needed)')
+    run_parser.add_argument('--no-shared', action='store_true', help='skip the shared replay memory')
+    compare_parser = commands.add_parser('compare', help='compare a run with a baseline, fails on regressions')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run(not args.no_agent, not args.no_shared)
+        if args.output is not None:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print('{} regression(s) above {:.0%}.'.format(len(regressions), args.threshold))
+            sys.exit(1)
@@ -1,11 +1,7 @@
-from random import randint
-from PIL import Image
-import cv2
 import numpy as np
 
 from snake import Snake
 from collections import deque
-from utils import add_info
 
 #BGR
 WHITE = (255,255,255)
@@ -16,7 +12,7 @@ class Snake_Env():
     """
     Represents the environment of the game.
     """
-    def __init__(self, max_width, max_height, init_width, init_height, display_width, display_height):
+    def __init__(self, max_width, max_height, init_width, init_height, display_width, display_height, seed=None):
         """
         Environment params.
         
@@ -32,6 +28,8 @@ class Snake_Env():
         :type display_width: int.
         :param display_height: height of the display box.
         :type display_height: int.
+        :param seed: seed of the random generator, or a numpy.random.SeedSequence.
+        :type seed: int.
         """
         self.MAX_WIDTH = max_width
         self.MAX_HEIGHT = max_height
@@ -40,6 +38,8 @@ class Snake_Env():
         self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT = display_width, display_height
         self.STATE_SPACE = 18 
         self.ACTION_SPACE = 4
+        self.RENDERER = None    #created by the first call to render()
+        self.rng = np.random.default_rng(seed)
                 
 
     def change_size(self, width_change, height_change):
@@ -82,8 +82,8 @@ class Snake_Env():
             if x2>max_w: x2 = max_w
             if y1<length-1: y1 = length-1
             if y2>max_h: y2 = max_h    
-        a = randint(x1, x2)
-        b = randint(y1, y2)
+        a = int(self.rng.integers(x1, x2+1))
+        b = int(self.rng.integers(y1, y2+1))
         return a,b  
 
 
@@ -99,22 +99,67 @@ class Snake_Env():
         return env
 
 
-    def reset(self):
+    def reset(self, seed=None):
         """
         Reset the environment. Initializes the snake and the food.
 
+        :param seed: if given, the random generator is seeded again, so the episode only depends on this seed.
+        :type seed: int.
         :return: state of the environment.
         :rtype: NumPy array with dimension (1, 18).
         """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
         snake_x, snake_y = self.get_randoms(length=4)  
-        self.SNAKE = Snake(snake_x, snake_y , self.WIDTH, self.HEIGHT)
+        self.SNAKE = Snake(snake_x, snake_y , self.WIDTH, self.HEIGHT, self.MAX_WIDTH, self.MAX_HEIGHT, rng=self.rng)
         self.VELOCITY = self.SNAKE.INITIAL_DIRECTION
         self.FOOD_X, self.FOOD_Y = self.get_randoms()
         self.STATE =  self.SNAKE.look(self.FOOD_X, self.FOOD_Y, self.get_boundaries())
 
         return self.STATE
 
-    
+
+    def restore(self, width, height, snake_x, snake_y, direction, food_x, food_y):
+        """
+        Reset the environment to a given start, e.g. to replay a recorded episode.
+
+        :param width: width of the game border.
+        :type width: int.
+        :param height: height of the game border.
+        :type height: int.
+        :param snake_x: head x position.
+        :type snake_x: int.
+        :param snake_y: head y position.
+        :type snake_y: int.
+        :param direction: initial direction of the snake.
+        :type direction: int.
+        :param food_x: food x position.
+        :type food_x: int.
+        :param food_y: food y position.
+        :type food_y: int.
+        :return: state of the environment.
+        :rtype: NumPy array with dimension (1, 18).
+        """
+        self.WIDTH, self.HEIGHT = width, height
+        self.SNAKE = Snake(snake_x, snake_y, self.WIDTH, self.HEIGHT, self.MAX_WIDTH, self.MAX_HEIGHT, direction)
+        self.VELOCITY = self.SNAKE.INITIAL_DIRECTION
+        self.move_food(food_x, food_y)
+        return self.STATE
+
+
+    def move_food(self, food_x, food_y):
+        """
+        Place the food at a given position.
+
+        :param food_x: food x position.
+        :type food_x: int.
+        :param food_y: food y position.
+        :type food_y: int.
+        """
+        self.FOOD_X, self.FOOD_Y = food_x, food_y
+        self.STATE =  self.SNAKE.look(self.FOOD_X, self.FOOD_Y, self.get_boundaries())
+
+
     def render(self, action):
         """
         Render the environment.
@@ -122,12 +167,14 @@ class Snake_Env():
         :param action: action chosen by the agent.
         :type action: int.
         """
-        env = np.zeros((self.MAX_HEIGHT, self.MAX_WIDTH, 3), dtype = np.uint8) #image with 3 channels RGB
-        env = self.play_region(env)                                            #add allowed boundary
-        env[self.FOOD_Y, self.FOOD_X] = FOOD_COLOR                             #add the food
-        env = self.SNAKE.draw(env)                                             #add the snake 
-        
-        img = add_info(self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT, env, action) 
+        import cv2      #only needed to display the game, training runs headless without it
+        from renderer import Renderer
+
+        if self.RENDERER is None:
+            self.RENDERER = Renderer(self.MAX_WIDTH, self.MAX_HEIGHT, self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT)
+        head_x, head_y = self.SNAKE.head_pos()
+        img = self.RENDERER.draw(self.SNAKE.GRID[:-2], head_x, head_y, self.SNAKE.is_alive, 
+                                    self.FOOD_X, self.FOOD_Y, self.get_boundaries(), action)
         cv2.imshow("Snake Game", img)
         
         if cv2.waitKey(1) & 0xFF == ord('q'):  #when Q is pressed
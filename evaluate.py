@@ -0,0 +1,147 @@
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+from numpy_network import load_weights, mlp_forward
+from vec_environment import Snake_VecEnv
+
+
+#Environment (same as test.py)
+max_env_width, max_env_height = 27, 27
+env_width, env_height = max_env_width-2, max_env_height-2
+display_width, display_height = max_env_width * 18, max_env_height * 18
+
+
+#Evaluation settings
+NUM_EPISODES = 10000
+NUM_ENVS = 256          #games played in lockstep by each process
+SEED = 0                #episode i is seeded with (SEED, i), the same episodes are played for every checkpoint
+
+DEATHS = {1: 'bite', 3: 'wall', 4: 'moves'}      #info codes of Snake_Env.step()
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def play(weights, num_episodes, num_envs, seed):
+    """
+    Plays greedy episodes with a batch of games. Episode i is seeded with (seed, i) whichever game plays it,
+    so every network gets the same boards, and the same food sequence as long as it eats the same number of foods.
+
+    A game takes the next episode when it finishes and every episode is played to the end, so short episodes
+    are not favoured by the ones still running at the end.
+
+    :param weights: kernels and biases of the network.
+    :type weights: list of NumPy arrays.
+    :param num_episodes: number of episodes.
+    :type num_episodes: int.
+    :param num_envs: number of games played at the same time.
+    :type num_envs: int.
+    :param seed: seed of the episodes.
+    :type seed: int or numpy.random.SeedSequence.
+    :return: score, length and info code of each episode.
+    :rtype: NumPy int arrays with dimension (num_episodes,).
+    """
+    num_envs = max(1, min(num_envs, num_episodes))
+    groups = np.zeros(num_envs, dtype=np.int64)      #all the games take their episodes from one counter
+    env = Snake_VecEnv(num_envs, max_env_width, max_env_height, env_width, env_height, display_width, display_height, seed, groups)
+    scores = np.zeros(num_episodes, dtype=np.int64)
+    lengths = np.zeros(num_episodes, dtype=np.int64)
+    infos = np.zeros(num_episodes, dtype=np.int64)
+    steps = np.zeros(num_envs, dtype=np.int64)
+
+    states = env.reset()
+    while (env.EPISODE < num_episodes).any():
+        episodes = env.EPISODE.copy()
+        actions = np.argmax(mlp_forward(weights, states), axis=1)
+        states, _, dones, step_infos = env.step(actions)
+        steps += 1
+
+        finished = np.flatnonzero(dones & (episodes < num_episodes))
+        scores[episodes[finished]] = env.FINAL_LENGTH[finished] - 4
+        lengths[episodes[finished]] = steps[finished]
+        infos[episodes[finished]] = step_infos[finished]
+        steps[dones] = 0
+
+    return scores, lengths, infos
+
+
+def summarize(values):
+    """
+    Mean, min, max and percentiles of a sample.
+
+    :param values: sample.
+    :type values: NumPy array.
+    :rtype: dict.
+    """
+    stats = {'mean': float(np.mean(values)), 'min': int(np.min(values)), 'max': int(np.max(values))}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats['p{}'.format(p)] = float(value)
+    stats['median'] = stats['p50']
+    return stats
+
+
+def evaluate(path, num_episodes=NUM_EPISODES, processes=1, num_envs=NUM_ENVS, seed=SEED):
+    """
+    Evaluates a checkpoint with a greedy policy, headless.
+
+    :param path: Keras HDF5 file with the weights.
+    :type path: str.
+    :param num_episodes: number of episodes.
+    :type num_episodes: int.
+    :param processes: number of processes.
+    :type processes: int.
+    :param num_envs: number of games played at the same time by each process.
+    :type num_envs: int.
+    :param seed: seed of the episodes. With the same seed and number of processes, every checkpoint plays the same episodes.
+    :type seed: int.
+    :return: statistics of the score, the episode length and the causes of death, and the speed.
+    :rtype: dict.
+    """
+    weights = load_weights(path)
+    processes = max(1, min(processes, num_episodes))     #every process plays at least one episode
+    seeds = np.random.SeedSequence(seed).spawn(processes) if processes > 1 else [seed]     #same episodes as tournament.py with one process
+    jobs = [(weights, num_episodes // processes + (i < num_episodes % processes), num_envs, seeds[i]) for i in range(processes)]
+
+    start = time.perf_counter()
+    if processes == 1:
+        results = [play(*jobs[0])]
+    else:
+        with mp.get_context('spawn').Pool(processes) as pool:
+            results = pool.starmap(play, jobs)
+    elapsed = time.perf_counter() - start
+
+    scores, lengths, infos = (np.concatenate(r) for r in zip(*results))
+    return {'checkpoint': path,
+            'episodes': int(len(scores)),
+            'seed': seed,
+            'score': summarize(scores),
+            'length': summarize(lengths),
+            'deaths': {name: float(np.mean(infos == code)) for code, name in DEATHS.items()},
+            'episodes_per_sec': len(scores)/elapsed,
+            'steps_per_sec': float(lengths.sum())/elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate checkpoints headless and print one JSON line per checkpoint.')
+    parser.add_argument('checkpoints', nargs='+', help='Keras HDF5 files, e.g. snake.h5')
+    parser.add_argument('--episodes', type=int, default=NUM_EPISODES)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--envs', type=int, default=NUM_ENVS, help='games played at the same time by each process')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', help='also append the results to this JSON lines file')
+    parser.add_argument('--min-score', type=float, help='exit with an error if a mean score is lower')
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.checkpoints:
+        result = evaluate(path, args.episodes, args.processes, args.envs, args.seed)
+        line = json.dumps(result)
+        print(line)
+        if args.output is not None:
+            with open(args.output, 'a') as f:
+                f.write(line + '\n')
+        if args.min_score is not None and result['score']['mean'] < args.min_score:
+            failed = True
+    sys.exit(1 if failed else 0)
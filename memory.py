@@ -1,25 +1,89 @@
+import os
 import numpy as np
-from collections import deque
-from random import sample
+from multiprocessing import shared_memory
+
+
+#Values of the sensors of Snake.look: code 0 means nothing seen and code k means 1/k
+SENSOR_VALUES = np.zeros(128, dtype=np.float32)
+SENSOR_VALUES[1:] = 1/np.arange(1, 128)
+
+
+def encode_states(states):
+    """
+    Losslessly packs states into one byte per feature: the food offsets as they are
+    and the sensors as the distance k of their value 1/k.
+
+    :param states: states from Snake.look.
+    :type states: NumPy array with dimension (18,) or (N, 18).
+    :return: packed states.
+    :rtype: NumPy int8 array with the same dimension.
+    :raises ValueError: if a food offset is not an int8 integer, or a sensor is negative or below 1/127.
+    """
+    states = np.asarray(states, dtype=np.float64)
+    exact = states.copy()
+    sensors = states[..., 2:]
+    np.rint(np.divide(1, sensors, out=exact[..., 2:], where=sensors != 0), out=exact[..., 2:])
+    codes = exact.astype(np.int8)
+    if not np.array_equal(codes, exact) or codes[..., 2:].min() < 0:     #wrapped, rounded or negative
+        raise ValueError('The states do not fit the int8 codes of encode_states.')
+    return codes
+
+
+def decode_states(codes, out):
+    """
+    Unpacks states packed by encode_states.
+
+    :param codes: packed states.
+    :type codes: NumPy int8 array with dimension (N, 18).
+    :param out: decoded states.
+    :type out: NumPy float32 array with dimension (N, 18).
+    """
+    out[:, :2] = codes[:, :2]
+    np.take(SENSOR_VALUES, codes[:, 2:], out=out[:, 2:])
+    return out
 
 
 class ReplayMemory:
     """
     Represents the memory of the agent. Stores info while training.
     """
-    def __init__(self, buffer_size, batch_size):
+    STATE_DTYPE = np.float32     #type of the stored states
+
+
+    def __init__(self, buffer_size, batch_size, state_size=18, rng=None):
         """
         Memory params.
 
         :param buffer_size: size of the experience replay buffer.
-        :type buffer_size: int. 
+        :type buffer_size: int.
         :param batch_size: size of the minibatch taken from the replay buffer.
         :type batch_size: int.
+        :param state_size: size of the state.
+        :type state_size: int.
+        :param rng: random generator used to sample, a new unseeded one if None.
+        :type rng: numpy.random.Generator.
         """
-        self.memory = deque(maxlen=buffer_size)
+        self.BUFFER_SIZE = buffer_size
         self.BATCH_SIZE = batch_size
-        
-    
+        self.rng = np.random.default_rng() if rng is None else rng
+
+        #Preallocated memory, written in a circular way
+        self.states = np.zeros((buffer_size, state_size), dtype=self.STATE_DTYPE)
+        self.actions = np.zeros(buffer_size, dtype=np.int8)
+        self.rewards = np.zeros(buffer_size, dtype=np.float32)
+        self.next_states = np.zeros((buffer_size, state_size), dtype=self.STATE_DTYPE)
+        self.dones = np.zeros(buffer_size, dtype=bool)
+        self.position = 0
+        self.size = 0
+
+        #Reusable minibatch buffers
+        self.batch_states = np.zeros((batch_size, state_size), dtype=np.float32)
+        self.batch_actions = np.zeros(batch_size, dtype=np.int8)
+        self.batch_rewards = np.zeros(batch_size, dtype=np.float32)
+        self.batch_next_states = np.zeros((batch_size, state_size), dtype=np.float32)
+        self.batch_dones = np.zeros(batch_size, dtype=bool)
+
+
     def add(self, state, action, reward, next_state, done):
         """
         Add a new experience to memory.
@@ -35,32 +99,744 @@ class ReplayMemory:
         :param done: if the snake died in this iteration.
         :type done: boolean.
         """
-        e = tuple((state, action, reward, next_state, done))
-        self.memory.append(e)
-        
-    
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.position = (i + 1) % self.BUFFER_SIZE
+        self.size = min(self.size + 1, self.BUFFER_SIZE)
+
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        Add several experiences to memory at once.
+
+        :param states: current states.
+        :type states: NumPy array with dimension (N, 18).
+        :param actions: actions chosen by the agent.
+        :type actions: NumPy int array with dimension (N,).
+        :param rewards: iteration rewards.
+        :type rewards: NumPy array with dimension (N,).
+        :param next_states: next states.
+        :type next_states: NumPy array with dimension (N, 18).
+        :param dones: if the snake died in each iteration.
+        :type dones: NumPy boolean array with dimension (N,).
+        """
+        idx = (self.position + np.arange(len(actions))) % self.BUFFER_SIZE
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.dones[idx] = dones
+        self.position = (self.position + len(actions)) % self.BUFFER_SIZE
+        self.size = min(self.size + len(actions), self.BUFFER_SIZE)
+
+
     def sample(self, state_shape):
         """
         Randomly sample a batch of experiences from memory.
+        The returned arrays are reused by the next call.
+
+        :param state_shape: state size.
+        :type state_shape: int.
+        """
+        idx = self.rng.choice(self.size, size=self.BATCH_SIZE, replace=False)
+        return self.gather(idx, state_shape)
+
+
+    def gather(self, idx, state_shape):
+        """
+        Copy the experiences at the given positions into the minibatch buffers.
 
+        :param idx: positions in memory.
+        :type idx: NumPy int array with dimension (BATCH_SIZE,).
         :param state_shape: state size.
         :type state_shape: int.
         """
-        experiences = sample(self.memory, k=self.BATCH_SIZE)
-        #Extracting the SARSA
-        states, actions, rewards, next_states, dones = zip(*experiences)
- 
-        #Converting them to numpy arrays
-        states = np.array(states).reshape(self.BATCH_SIZE, state_shape)
-        actions = np.array(actions, dtype='int').reshape(self.BATCH_SIZE)
-        rewards = np.array(rewards).reshape(self.BATCH_SIZE)
-        next_states = np.array(next_states).reshape(self.BATCH_SIZE,state_shape)
-        dones = np.array(dones).reshape(self.BATCH_SIZE)
-        
-        return states, actions, rewards, next_states, dones
-    
-    def __len__(self):     
+        np.take(self.states, idx, axis=0, out=self.batch_states)
+        np.take(self.actions, idx, out=self.batch_actions)
+        np.take(self.rewards, idx, out=self.batch_rewards)
+        np.take(self.next_states, idx, axis=0, out=self.batch_next_states)
+        np.take(self.dones, idx, out=self.batch_dones)
+
+        states = self.batch_states.reshape(self.BATCH_SIZE, state_shape)
+        next_states = self.batch_next_states.reshape(self.BATCH_SIZE, state_shape)
+        return states, self.batch_actions, self.batch_rewards, next_states, self.batch_dones
+
+
+    def __len__(self):
         """
         Returns the len of the memory stored.
         """
-        return len(self.memory)
+        return self.size
+
+
+class CompactReplayMemory(ReplayMemory):
+    """
+    Represents a memory that stores the states packed in 18 bytes (see encode_states).
+    """
+    STATE_DTYPE = np.int8
+
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        Add a new experience to memory, packing its states.
+        """
+        super().add(encode_states(state), action, reward, encode_states(next_state), done)
+
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        Add several experiences to memory at once, packing their states.
+        """
+        super().add_batch(encode_states(states), actions, rewards, encode_states(next_states), dones)
+
+
+    def gather(self, idx, state_shape):
+        """
+        Unpack the experiences at the given positions into the minibatch buffers.
+
+        :param idx: positions in memory.
+        :type idx: NumPy int array with dimension (BATCH_SIZE,).
+        :param state_shape: state size.
+        :type state_shape: int.
+        """
+        decode_states(self.states[idx], self.batch_states)
+        decode_states(self.next_states[idx], self.batch_next_states)
+        np.take(self.actions, idx, out=self.batch_actions)
+        np.take(self.rewards, idx, out=self.batch_rewards)
+        np.take(self.dones, idx, out=self.batch_dones)
+
+        states = self.batch_states.reshape(self.BATCH_SIZE, state_shape)
+        next_states = self.batch_next_states.reshape(self.BATCH_SIZE, state_shape)
+        return states, self.batch_actions, self.batch_rewards, next_states, self.batch_dones
+
+
+class TrajectoryReplayMemory:
+    """
+    Represents a memory that stores each observation once, in the order it was seen.
+    The experience at position i goes from observation i to observation i+1, so next states are not copied.
+    """
+    def __init__(self, buffer_size, batch_size, state_size=18, rng=None):
+        """
+        Memory params.
+
+        :param buffer_size: number of observations kept.
+        :type buffer_size: int.
+        :param batch_size: size of the minibatch taken from the replay buffer.
+        :type batch_size: int.
+        :param state_size: size of the state.
+        :type state_size: int.
+        :param rng: random generator used to sample, a new unseeded one if None.
+        :type rng: numpy.random.Generator.
+        """
+        self.BUFFER_SIZE = buffer_size
+        self.BATCH_SIZE = batch_size
+        self.rng = np.random.default_rng() if rng is None else rng
+
+        #Observations and the experience starting at each of them. The last observation of an episode starts none.
+        self.observations = np.zeros((buffer_size, state_size), dtype=np.float32)
+        self.actions = np.zeros(buffer_size, dtype=np.int8)
+        self.rewards = np.zeros(buffer_size, dtype=np.float32)
+        self.dones = np.zeros(buffer_size, dtype=bool)
+        self.valid = np.zeros(buffer_size, dtype=bool)      #if an experience starts at this observation
+        self.position = 0       #position of the last observation written
+        self.size = 0           #valid experiences
+        self.written = 0        #observations are only found below this position
+        self.open = False       #if the last observation can start the next experience
+
+        #Reusable minibatch buffers
+        self.batch_indices = np.zeros(batch_size, dtype=np.intp)
+        self.batch_states = np.zeros((batch_size, state_size), dtype=np.float32)
+        self.batch_actions = np.zeros(batch_size, dtype=np.int8)
+        self.batch_rewards = np.zeros(batch_size, dtype=np.float32)
+        self.batch_next_states = np.zeros((batch_size, state_size), dtype=np.float32)
+        self.batch_dones = np.zeros(batch_size, dtype=bool)
+
+
+    def write_observation(self, i, observation):
+        """
+        Write an observation, dropping the experience that started at its position.
+
+        :param i: position.
+        :type i: int.
+        :param observation: state.
+        :type observation: NumPy array with dimension (1, 18).
+        """
+        if self.valid[i]:
+            self.valid[i] = False
+            self.size -= 1
+        elif i >= self.written:
+            self.written = i + 1
+        self.observations[i] = observation
+
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        Add a new experience to memory. Its state is only written if it does not continue the last experience.
+
+        :param state: current state.
+        :type state: NumPy array with dimension (1, 18).
+        :param action: action chosen by the agent.
+        :type action: int.
+        :param reward: iteration reward.
+        :type reward: float.
+        :param next_state: next state.
+        :type next_state: NumPy array with dimension (1, 18).
+        :param done: if the snake died in this iteration.
+        :type done: boolean.
+        """
+        i = self.position
+        if not (self.open and np.array_equal(self.observations[i], np.asarray(state, dtype=np.float32))):   #new episode
+            i = (i + 1) % self.BUFFER_SIZE
+            self.write_observation(i, state)
+
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.valid[i] = True
+        self.size += 1
+
+        self.position = (i + 1) % self.BUFFER_SIZE
+        self.write_observation(self.position, next_state)
+        self.open = not done
+
+
+    def sample(self, state_shape):
+        """
+        Randomly sample a batch of experiences from memory.
+        The returned arrays are reused by the next call, the positions are kept in batch_indices.
+
+        :param state_shape: state size.
+        :type state_shape: int.
+        """
+        if self.size < 2*self.BATCH_SIZE:
+            starts = np.flatnonzero(self.valid[:self.written])
+            idx = starts[self.rng.choice(len(starts), size=self.BATCH_SIZE, replace=False)]
+        else:
+            #Only the last observation of each episode starts no experience, so drawing positions and
+            #dropping the invalid and repeated ones rarely needs a second round, without scanning the buffer
+            idx = np.empty(0, dtype=np.intp)
+            while len(idx) < self.BATCH_SIZE:
+                candidates = self.rng.integers(0, self.written, 2*(self.BATCH_SIZE - len(idx)))
+                idx = np.concatenate((idx, candidates[self.valid[candidates]]))
+                _, first = np.unique(idx, return_index=True)
+                idx = idx[np.sort(first)][:self.BATCH_SIZE]
+        self.batch_indices[:] = idx
+
+        np.take(self.observations, idx, axis=0, out=self.batch_states)
+        np.take(self.observations, (idx + 1) % self.BUFFER_SIZE, axis=0, out=self.batch_next_states)
+        np.take(self.actions, idx, out=self.batch_actions)
+        np.take(self.rewards, idx, out=self.batch_rewards)
+        np.take(self.dones, idx, out=self.batch_dones)
+
+        states = self.batch_states.reshape(self.BATCH_SIZE, state_shape)
+        next_states = self.batch_next_states.reshape(self.BATCH_SIZE, state_shape)
+        return states, self.batch_actions, self.batch_rewards, next_states, self.batch_dones
+
+
+    def nstep_returns(self, n, gamma):
+        """
+        N-step returns of the last sampled batch, read from the stored trajectories.
+        They stop early at the end of an episode or at the newest experience.
+
+        :param n: max number of steps.
+        :type n: int.
+        :param gamma: discount factor.
+        :type gamma: float.
+        :return: discounted rewards, positions of the states after them, if the episode ended and number of steps.
+        :rtype: NumPy arrays with dimension (BATCH_SIZE,).
+        """
+        idx = self.batch_indices
+        returns = np.zeros(self.BATCH_SIZE)
+        dones = np.zeros(self.BATCH_SIZE, dtype=bool)
+        steps = np.zeros(self.BATCH_SIZE, dtype=np.intp)
+        running = np.ones(self.BATCH_SIZE, dtype=bool)
+        for k in range(n):
+            i = (idx + k) % self.BUFFER_SIZE
+            running &= self.valid[i] & ((self.position - idx) % self.BUFFER_SIZE > k)
+            returns[running] += gamma**k*self.rewards[i[running]]
+            steps[running] += 1
+            dones[running] = self.dones[i[running]]
+            running &= ~self.dones[i]
+        return returns, (idx + steps) % self.BUFFER_SIZE, dones, steps
+
+
+    def __len__(self):
+        """
+        Returns the number of experiences stored.
+        """
+        return self.size
+
+
+class SumTree:
+    """
+    Represents a binary tree stored in an array where each node holds the sum of its children.
+    Leaves hold the priorities of the experiences.
+    """
+    def __init__(self, capacity):
+        """
+        Tree params.
+
+        :param capacity: number of leaves.
+        :type capacity: int.
+        """
+        self.LEAVES = 1 << max(capacity-1, 1).bit_length()     #power of two
+        self.DEPTH = self.LEAVES.bit_length() - 1
+        self.tree = np.zeros(2*self.LEAVES)     #root at index 1, leaves from LEAVES to 2*LEAVES-1
+
+
+    def total(self):
+        """
+        Returns the sum of all priorities.
+        """
+        return self.tree[1]
+
+
+    def update(self, idx, priorities):
+        """
+        Set the priorities of some leaves and update their ancestors. O(log n).
+
+        :param idx: leaves to update.
+        :type idx: NumPy int array.
+        :param priorities: new priorities.
+        :type priorities: NumPy array.
+        """
+        nodes = np.asarray(idx) + self.LEAVES
+        self.tree[nodes] = priorities
+        for _ in range(self.DEPTH):     #repeated nodes just write the same sum again
+            nodes = nodes // 2
+            self.tree[nodes] = self.tree[2*nodes] + self.tree[2*nodes+1]
+
+
+    def update_one(self, idx, priority):
+        """
+        Set the priority of one leaf and update its ancestors, with plain indexing that is much
+        faster than update() for a single leaf.
+
+        :param idx: leaf to update.
+        :type idx: int.
+        :param priority: new priority.
+        :type priority: float.
+        """
+        tree = self.tree
+        node = idx + self.LEAVES
+        tree[node] = priority
+        for _ in range(self.DEPTH):
+            node >>= 1
+            tree[node] = tree[2*node] + tree[2*node+1]
+
+
+    def find(self, values):
+        """
+        Find the leaves where the cumulative sum of priorities reaches each value. O(log n).
+
+        :param values: values between 0 and the total sum.
+        :type values: NumPy array.
+        :return: leaves found.
+        :rtype: NumPy int array.
+        """
+        nodes = np.ones(len(values), dtype=np.intp)
+        for _ in range(self.DEPTH):
+            left = 2*nodes
+            right = values > self.tree[left]
+            values = np.where(right, values - self.tree[left], values)
+            nodes = np.where(right, left+1, left)
+        return nodes - self.LEAVES
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """
+    Represents a memory where experiences are sampled proportionally to their last TD error.
+    """
+    def __init__(self, buffer_size, batch_size, state_size=18, alpha=0.6, beta=0.4, beta_increment=1e-5, rng=None):
+        """
+        Memory params.
+
+        :param buffer_size: size of the experience replay buffer.
+        :type buffer_size: int.
+        :param batch_size: size of the minibatch taken from the replay buffer.
+        :type batch_size: int.
+        :param state_size: size of the state.
+        :type state_size: int.
+        :param alpha: how much the TD error is used, 0 is uniform sampling.
+        :type alpha: float.
+        :param beta: importance-sampling correction, increased up to 1 while training.
+        :type beta: float.
+        :param beta_increment: beta increase at each sample.
+        :type beta_increment: float.
+        :param rng: random generator used to sample, a new unseeded one if None.
+        :type rng: numpy.random.Generator.
+        """
+        super().__init__(buffer_size, batch_size, state_size, rng)
+        self.ALPHA = alpha
+        self.beta = beta
+        self.BETA_INCREMENT = beta_increment
+        self.EPSILON = 1e-3     #keeps every experience with a chance to be sampled
+        self.tree = SumTree(buffer_size)
+        self.max_priority = 1.0
+
+        self.batch_indices = np.zeros(batch_size, dtype=np.intp)
+        self.batch_weights = np.ones(batch_size, dtype=np.float32)
+
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        Add a new experience to memory with the highest priority, so it is replayed at least once.
+        """
+        self.tree.update_one(self.position, self.max_priority)
+        super().add(state, action, reward, next_state, done)
+
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        Add several experiences to memory at once with the highest priority.
+        """
+        self.tree.update((self.position + np.arange(len(actions))) % self.BUFFER_SIZE, self.max_priority)
+        super().add_batch(states, actions, rewards, next_states, dones)
+
+
+    def sample(self, state_shape):
+        """
+        Sample a batch of experiences proportionally to their priorities.
+        The indices and importance-sampling weights of the batch are kept in batch_indices and batch_weights.
+
+        :param state_shape: state size.
+        :type state_shape: int.
+        """
+        #One value in each of BATCH_SIZE equal segments of the total priority
+        segment = self.tree.total()/self.BATCH_SIZE
+        values = (np.arange(self.BATCH_SIZE) + self.rng.random(self.BATCH_SIZE))*segment
+        idx = np.minimum(self.tree.find(values), self.size-1)
+        self.batch_indices[:] = idx
+
+        probabilities = self.tree.tree[idx + self.tree.LEAVES]/self.tree.total()
+        weights = (self.size*probabilities)**(-self.beta)
+        self.batch_weights[:] = weights/weights.max()
+        self.beta = min(1.0, self.beta + self.BETA_INCREMENT)
+        return self.gather(idx, state_shape)
+
+
+    def update_priorities(self, td_errors):
+        """
+        Update the priorities of the last sampled batch.
+
+        :param td_errors: TD errors of the last sampled batch.
+        :type td_errors: NumPy array with dimension (BATCH_SIZE,).
+        """
+        priorities = (np.abs(td_errors) + self.EPSILON)**self.ALPHA
+        self.tree.update(self.batch_indices, priorities)
+        self.max_priority = max(self.max_priority, priorities.max())
+
+
+class MappedReplayMemory(ReplayMemory):
+    """
+    Represents a memory kept in memory-mapped files on disk, so it can be much larger than the RAM
+    and reopened to resume training with the experiences of a previous session.
+    """
+    def __init__(self, path, buffer_size, batch_size, state_size=18, rng=None):
+        """
+        Memory params. Opens the memory in path if it exists, otherwise creates it.
+
+        :param path: directory of the memory files.
+        :type path: str.
+        :param buffer_size: size of the experience replay buffer.
+        :type buffer_size: int.
+        :param batch_size: size of the minibatch taken from the replay buffer.
+        :type batch_size: int.
+        :param state_size: size of the state.
+        :type state_size: int.
+        :param rng: random generator used to sample, a new unseeded one if None.
+        :type rng: numpy.random.Generator.
+        """
+        self.PATH = path
+        self.BUFFER_SIZE = buffer_size
+        self.BATCH_SIZE = batch_size
+        self.rng = np.random.default_rng() if rng is None else rng
+
+        #One file per column, plus the write position and the size of the memory
+        os.makedirs(path, exist_ok=True)
+        self.states = self.open_column('states', (buffer_size, state_size), np.float32)
+        self.actions = self.open_column('actions', (buffer_size,), np.int8)
+        self.rewards = self.open_column('rewards', (buffer_size,), np.float32)
+        self.next_states = self.open_column('next_states', (buffer_size, state_size), np.float32)
+        self.dones = self.open_column('dones', (buffer_size,), bool)
+        self.meta = self.open_column('meta', (2,), np.int64)
+
+        #Reusable minibatch buffers
+        self.batch_states = np.zeros((batch_size, state_size), dtype=np.float32)
+        self.batch_actions = np.zeros(batch_size, dtype=np.int8)
+        self.batch_rewards = np.zeros(batch_size, dtype=np.float32)
+        self.batch_next_states = np.zeros((batch_size, state_size), dtype=np.float32)
+        self.batch_dones = np.zeros(batch_size, dtype=bool)
+
+
+    def open_column(self, name, shape, dtype):
+        """
+        Opens a column file, or creates it filled with zeros.
+
+        :param name: name of the column.
+        :type name: str.
+        :param shape: shape of the column.
+        :type shape: tuple of int.
+        :param dtype: type of the column.
+        :type dtype: NumPy dtype.
+        :return: memory-mapped column.
+        :rtype: NumPy memmap.
+        """
+        filename = os.path.join(self.PATH, name + '.npy')
+        if not os.path.exists(filename):
+            return np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+        column = np.lib.format.open_memmap(filename, mode='r+')
+        if column.shape != shape or column.dtype != dtype:
+            raise ValueError('{} has shape {} and type {}, expected {} and {}.'.format(filename, column.shape, column.dtype, shape, np.dtype(dtype)))
+        return column
+
+
+    @property
+    def position(self):
+        """
+        Next position to be written, stored on disk.
+        """
+        return int(self.meta[0])
+
+    @position.setter
+    def position(self, value):
+        self.meta[0] = value
+
+    @property
+    def size(self):
+        """
+        Number of experiences stored, stored on disk.
+        """
+        return int(self.meta[1])
+
+    @size.setter
+    def size(self, value):
+        self.meta[1] = value
+
+
+    def sample(self, state_shape):
+        """
+        Randomly sample a batch of experiences from memory, reading the files in order.
+        The returned arrays are reused by the next call.
+
+        :param state_shape: state size.
+        :type state_shape: int.
+        """
+        idx = np.sort(self.rng.choice(self.size, size=self.BATCH_SIZE, replace=False))
+        return self.gather(idx, state_shape)
+
+
+    def flush(self):
+        """
+        Writes the changes to disk.
+        """
+        for column in (self.states, self.actions, self.rewards, self.next_states, self.dones, self.meta):
+            column.flush()
+
+
+class SharedReplayMemory:
+    """
+    Represents a memory shared by several processes. Each writer process owns a slice of the buffer,
+    so adding needs no lock, and the learner samples from all slices. A writer announces the slots it
+    is about to overwrite in `writing` and publishes them in `added` once written, so the learner never
+    returns a transition that is only partly written.
+    """
+    def __init__(self, buffer_size, batch_size, state_size=18, num_writers=1, rng=None):
+        """
+        Memory params.
+
+        :param buffer_size: size of the experience replay buffer.
+        :type buffer_size: int.
+        :param batch_size: size of the minibatch taken from the replay buffer.
+        :type batch_size: int.
+        :param state_size: size of the state.
+        :type state_size: int.
+        :param num_writers: number of processes adding experiences.
+        :type num_writers: int.
+        :param rng: random generator used to sample, a new unseeded one if None. It is pickled with
+            the memory, so a learner in another process keeps the same stream.
+        :type rng: numpy.random.Generator.
+        """
+        self.BUFFER_SIZE = buffer_size
+        self.BATCH_SIZE = batch_size
+        self.STATE_SIZE = state_size
+        self.NUM_WRITERS = num_writers
+        self.SLOTS = buffer_size // num_writers      #size of the slice of each writer
+
+        self.shm = shared_memory.SharedMemory(create=True, size=self.layout()[-1])
+        self.owner = True
+        self.writer = 0
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.attach()
+
+
+    def layout(self):
+        """
+        Byte offsets of the arrays inside the shared memory block.
+
+        :return: offsets of added and writing counts, states, next_states, rewards, actions, dones and the total size.
+        :rtype: list of int.
+        """
+        n = self.SLOTS*self.NUM_WRITERS
+        sizes = [8*self.NUM_WRITERS, 8*self.NUM_WRITERS, 4*n*self.STATE_SIZE, 4*n*self.STATE_SIZE, 4*n, n, n]
+        return [int(offset) for offset in np.cumsum([0] + sizes)]
+
+
+    def attach(self):
+        """
+        Creates the NumPy views over the shared memory block and the local minibatch buffers.
+        """
+        n, size, buf = self.SLOTS*self.NUM_WRITERS, self.STATE_SIZE, self.shm.buf
+        offsets = self.layout()
+        self.added = np.ndarray(self.NUM_WRITERS, dtype=np.int64, buffer=buf, offset=offsets[0])   #experiences added by each writer
+        self.writing = np.ndarray(self.NUM_WRITERS, dtype=np.int64, buffer=buf, offset=offsets[1])     #added once the current write is done
+        self.states = np.ndarray((n, size), dtype=np.float32, buffer=buf, offset=offsets[2])
+        self.next_states = np.ndarray((n, size), dtype=np.float32, buffer=buf, offset=offsets[3])
+        self.rewards = np.ndarray(n, dtype=np.float32, buffer=buf, offset=offsets[4])
+        self.actions = np.ndarray(n, dtype=np.int8, buffer=buf, offset=offsets[5])
+        self.dones = np.ndarray(n, dtype=bool, buffer=buf, offset=offsets[6])
+
+        self.batch_states = np.zeros((self.BATCH_SIZE, size), dtype=np.float32)
+        self.batch_actions = np.zeros(self.BATCH_SIZE, dtype=np.int8)
+        self.batch_rewards = np.zeros(self.BATCH_SIZE, dtype=np.float32)
+        self.batch_next_states = np.zeros((self.BATCH_SIZE, size), dtype=np.float32)
+        self.batch_dones = np.zeros(self.BATCH_SIZE, dtype=bool)
+
+
+    def __getstate__(self):
+        """
+        Only the name of the shared memory block and the random generator are sent to other processes.
+        """
+        return {'BUFFER_SIZE': self.BUFFER_SIZE, 'BATCH_SIZE': self.BATCH_SIZE, 'STATE_SIZE': self.STATE_SIZE,
+                'NUM_WRITERS': self.NUM_WRITERS, 'SLOTS': self.SLOTS, 'writer': self.writer, 'rng': self.rng,
+                'name': self.shm.name}
+
+
+    def __setstate__(self, state):
+        """
+        Attaches to the shared memory block in another process.
+        """
+        name = state.pop('name')
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = False
+        self.attach()
+
+
+    def set_writer(self, writer):
+        """
+        Selects the slice written by this process.
+
+        :param writer: number of the writer, from 0 to num_writers-1.
+        :type writer: int.
+        """
+        self.writer = writer
+
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        Add a new experience to the slice of this process.
+
+        :param state: current state.
+        :type state: NumPy array with dimension (1, 18).
+        :param action: action chosen by the agent.
+        :type action: int.
+        :param reward: iteration reward.
+        :type reward: float.
+        :param next_state: next state.
+        :type next_state: NumPy array with dimension (1, 18).
+        :param done: if the snake died in this iteration.
+        :type done: boolean.
+        """
+        count = int(self.added[self.writer])
+        i = self.writer*self.SLOTS + count % self.SLOTS
+        self.writing[self.writer] = count + 1     #announced before the slot is overwritten
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.added[self.writer] = count + 1     #published after the data is written
+
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        Add several experiences to the slice of this process at once.
+
+        :param states: current states.
+        :type states: NumPy array with dimension (N, 18).
+        :param actions: actions chosen by the agent.
+        :type actions: NumPy int array with dimension (N,).
+        :param rewards: iteration rewards.
+        :type rewards: NumPy array with dimension (N,).
+        :param next_states: next states.
+        :type next_states: NumPy array with dimension (N, 18).
+        :param dones: if the snake died in each iteration.
+        :type dones: NumPy boolean array with dimension (N,).
+        """
+        count = int(self.added[self.writer])
+        idx = self.writer*self.SLOTS + (count + np.arange(len(actions))) % self.SLOTS
+        self.writing[self.writer] = count + len(actions)
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.dones[idx] = dones
+        self.added[self.writer] = count + len(actions)
+
+
+    def sample(self, state_shape):
+        """
+        Randomly sample a batch of experiences from all the slices, leaving out the slots being written.
+        The returned arrays are reused by the next call.
+
+        :param state_shape: state size.
+        :type state_shape: int.
+        """
+        while True:
+            #Experiences are numbered by writer, number k is in slot k % SLOTS of the slice
+            last = self.added.copy()
+            first = np.maximum(self.writing - self.SLOTS, 0)
+            sizes = np.maximum(last - first, 0)
+            ends = np.cumsum(sizes)
+            r = self.rng.choice(ends[-1], size=self.BATCH_SIZE, replace=False)
+            writer = np.searchsorted(ends, r, side='right')
+            number = first[writer] + r - (ends - sizes)[writer]
+            idx = writer*self.SLOTS + number % self.SLOTS
+
+            np.take(self.states, idx, axis=0, out=self.batch_states)
+            np.take(self.actions, idx, out=self.batch_actions)
+            np.take(self.rewards, idx, out=self.batch_rewards)
+            np.take(self.next_states, idx, axis=0, out=self.batch_next_states)
+            np.take(self.dones, idx, out=self.batch_dones)
+
+            #Sampled again if a writer started overwriting one of the slots during the copy
+            if (number >= self.writing[writer] - self.SLOTS).all():
+                break
+
+        states = self.batch_states.reshape(self.BATCH_SIZE, state_shape)
+        next_states = self.batch_next_states.reshape(self.BATCH_SIZE, state_shape)
+        return states, self.batch_actions, self.batch_rewards, next_states, self.batch_dones
+
+
+    def __len__(self):
+        """
+        Returns the len of the memory stored, without the slots being written.
+        """
+        return int(np.maximum(self.added - np.maximum(self.writing - self.SLOTS, 0), 0).sum())
+
+
+    def close(self):
+        """
+        Releases the shared memory. The block is destroyed when the creating process closes it.
+        """
+        views = ['added', 'writing', 'states', 'next_states', 'rewards', 'actions', 'dones']
+        for name in views:
+            delattr(self, name)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
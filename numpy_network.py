@@ -0,0 +1,142 @@
+import h5py
+import numpy as np
+
+
+def mlp_forward(weights, state):
+    """
+    Evaluates a stack of Dense + ReLU layers with a linear output layer.
+
+    :param weights: kernels and biases of the layers, in order.
+    :type weights: list of NumPy arrays.
+    :param state: current state.
+    :type state: NumPy array with dimension (18,) or (N, 18).
+    :return: action-values.
+    :rtype: NumPy array with dimension (4,) or (N, 4).
+    """
+    x = np.asarray(state, dtype=np.float32)
+    for i in range(0, len(weights)-2, 2):     #Dense + ReLU layers
+        x = np.maximum(x @ weights[i] + weights[i+1], 0)
+    return x @ weights[-2] + weights[-1]
+
+
+def load_weights(name):
+    """
+    Reads the Dense kernels and biases of a Keras HDF5 file, with or without the model config.
+
+    :param name: file name.
+    :type name: str.
+    :return: kernels and biases of the layers, in order.
+    :rtype: list of NumPy arrays.
+    """
+    weights = []
+    with h5py.File(name, 'r') as f:
+        group = f['model_weights'] if 'model_weights' in f else f
+        for layer in group.attrs['layer_names']:
+            layer = group[layer.decode() if isinstance(layer, bytes) else layer]
+            for weight in layer.attrs['weight_names']:
+                weights.append(np.array(layer[weight.decode() if isinstance(weight, bytes) else weight], dtype=np.float32))
+    return weights
+
+
+def save_weights(name, weights):
+    """
+    Writes Dense kernels and biases in the layout of Keras' save_weights, so that the file can be read
+    by QNetwork.load() and load_weights() without Keras.
+
+    :param name: file name.
+    :type name: str.
+    :param weights: kernels and biases of the layers, in order.
+    :type weights: list of NumPy arrays.
+    """
+    with h5py.File(name, 'w') as f:
+        layer_names = ['dense' if i == 0 else 'dense_{}'.format(i) for i in range(len(weights)//2)]
+        f.attrs['layer_names'] = [layer.encode() for layer in layer_names]
+        for layer, kernel, bias in zip(layer_names, weights[0::2], weights[1::2]):
+            group = f.create_group(layer)
+            group.attrs['weight_names'] = ['{}/kernel:0'.format(layer).encode(), '{}/bias:0'.format(layer).encode()]
+            group.create_dataset('{}/kernel:0'.format(layer), data=kernel)
+            group.create_dataset('{}/bias:0'.format(layer), data=bias)
+
+
+class NumpyQNetwork:
+    """
+    Represents the DQN's Neural Network for inference only, without Keras.
+    """
+    def __init__(self, input_shape, hidden_units, output_size, learning_rate=0.01, seed=None):
+        """
+        Params of the Neural Network, same as QNetwork.
+
+        :param input_shape: state size
+        :type input_shape: int
+        :param hidden_units: number of neurons in each layer.
+        :type hidden_units: tupple with dimension (1, 3).
+        :param output_size: size of the output.
+        :type output_size: int
+        :param learning_rate: not used, there is no training.
+        :type learning_rate: float.
+        :param seed: seed of the initial weights.
+        :type seed: int.
+        """
+        self.input_shape = input_shape
+        self.hidden_units = hidden_units
+        self.output_size = output_size
+        self.learning_rate = learning_rate
+        self.model = None
+
+        #Glorot uniform kernels and zero biases, as in Keras
+        sizes = (input_shape,) + tuple(hidden_units) + (output_size,)
+        rng = np.random.default_rng(seed)
+        self.weights = []
+        for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+            limit = np.sqrt(6/(fan_in + fan_out))
+            self.weights.append(rng.uniform(-limit, limit, (fan_in, fan_out)).astype(np.float32))
+            self.weights.append(np.zeros(fan_out, dtype=np.float32))
+
+
+    def predict(self, state, batch_size=1):
+        """
+        Predict best action to take.
+
+        :param state: current state.
+        :type state: NumPy array with dimension (N, 18).
+        :param batch_size: not used, the whole input is evaluated at once.
+        :type batch_size: int.
+        """
+        return mlp_forward(self.weights, state)
+
+
+    def predict_numpy(self, state):
+        """
+        Predict best action to take.
+
+        :param state: current state.
+        :type state: NumPy array with dimension (18,) or (N, 18).
+        """
+        return mlp_forward(self.weights, state)
+
+
+    def get_weights(self):
+        """
+        Returns the weights of the neural network.
+        """
+        return self.weights
+
+
+    def set_weights(self, weights):
+        """
+        Replaces the weights of the neural network.
+
+        :param weights: weights of another network with the same layers.
+        :type weights: list of NumPy arrays.
+        """
+        self.weights = [np.array(w, dtype=np.float32) for w in weights]
+
+
+    def load(self, name):
+        """
+        Loads the neural network's weights from disk.
+
+        :param name: model's name.
+        :type name: str.
+        """
+        self.weights = load_weights(name)
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+from bisect import bisect_left
+import numpy as np
+
+
+#Upper bounds of the histogram buckets in seconds, 1 µs to 10 s
+BUCKETS = tuple(float('{}e{}'.format(m, e)) for e in range(-6, 1) for m in (1, 2.5, 5)) + (10.0,)
+WINDOW = 1000           #last durations of each phase kept for the percentiles
+PERCENTILES = (50, 95, 99)
+
+
+class Phase:
+    """
+    Durations of one phase: a cumulative histogram and a rolling window of the last ones.
+    """
+    def __init__(self, window=WINDOW):
+        """
+        Creates an empty phase.
+
+        :param window: number of recent durations kept for the percentiles.
+        :type window: int.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0]*(len(BUCKETS) + 1)     #the last one is +Inf
+        self.recent = np.zeros(window)
+
+
+    def add(self, duration):
+        """
+        Adds one duration.
+
+        :param duration: seconds.
+        :type duration: float.
+        """
+        self.recent[self.count % len(self.recent)] = duration
+        self.count += 1
+        self.total += duration
+        self.buckets[bisect_left(BUCKETS, duration)] += 1
+
+
+    def summary(self):
+        """
+        Totals and percentiles of the recent durations.
+
+        :rtype: dict.
+        """
+        recent = self.recent[:min(self.count, len(self.recent))]
+        stats = {'count': self.count, 'total': self.total, 'mean': self.total/self.count}
+        for p, value in zip(PERCENTILES, np.percentile(recent, PERCENTILES)):
+            stats['p{}'.format(p)] = float(value)
+        stats['max'] = float(recent.max())
+        return stats
+
+
+class Profiler:
+    """
+    Per-phase timers and event counters of the training loop, exported as JSON lines or as a
+    Prometheus text file. When disabled, start() and stop() return right away.
+
+    Usage:
+        t = profiler.start()
+        env.step(action)
+        profiler.stop('env.step', t)
+    """
+    def __init__(self, enabled=False, json_path=None, prometheus_path=None, interval=60.0):
+        """
+        Profiler params.
+
+        :param enabled: if the timers and counters are recorded.
+        :type enabled: boolean.
+        :param json_path: file where a JSON line is appended on each export, none if None.
+        :type json_path: str.
+        :param prometheus_path: file rewritten on each export in the Prometheus text format, none if None.
+        :type prometheus_path: str.
+        :param interval: minimum seconds between two exports by tick().
+        :type interval: float.
+        """
+        self.enabled = enabled
+        self.JSON_PATH = json_path
+        self.PROMETHEUS_PATH = prometheus_path
+        self.INTERVAL = interval
+        self.phases = {}
+        self.counters = {}
+        self.created = self.last_export = time.perf_counter()
+
+
+    def start(self):
+        """
+        Starts timing a phase.
+
+        :return: start time, to be given to stop().
+        :rtype: float.
+        """
+        return time.perf_counter() if self.enabled else 0.0
+
+
+    def stop(self, name, start):
+        """
+        Records the duration of a phase.
+
+        :param name: phase, e.g. 'env.step'.
+        :type name: str.
+        :param start: value returned by start().
+        :type start: float.
+        """
+        if not self.enabled:
+            return
+        duration = time.perf_counter() - start
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase()
+        phase.add(duration)
+
+
+    def count(self, name, n=1):
+        """
+        Increments a counter.
+
+        :param name: counter, e.g. 'learn_calls'.
+        :type name: str.
+        :param n: increment.
+        :type n: int.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+
+    def summary(self):
+        """
+        Statistics of every phase and the counters.
+
+        :rtype: dict.
+        """
+        return {'time': time.time(),
+                'elapsed': time.perf_counter() - self.created,
+                'phases': {name: phase.summary() for name, phase in self.phases.items()},
+                'counters': dict(self.counters)}
+
+
+    def prometheus(self):
+        """
+        Phases as histograms and counters in the Prometheus text format.
+
+        :rtype: str.
+        """
+        lines = ['# HELP snake_phase_seconds Duration of the phases of the training loop.',
+                 '# TYPE snake_phase_seconds histogram']
+        for name, phase in self.phases.items():
+            cumulative = np.cumsum(phase.buckets)
+            for bound, n in zip(BUCKETS + ('+Inf',), cumulative):
+                lines.append('snake_phase_seconds_bucket{{phase="{}",le="{}"}} {}'.format(name, bound, n))
+            lines.append('snake_phase_seconds_sum{{phase="{}"}} {!r}'.format(name, phase.total))
+            lines.append('snake_phase_seconds_count{{phase="{}"}} {}'.format(name, phase.count))
+        lines += ['# HELP snake_events_total Events of the training loop.',
+                  '# TYPE snake_events_total counter']
+        for name, n in self.counters.items():
+            lines.append('snake_events_total{{name="{}"}} {}'.format(name, n))
+        return '\n'.join(lines) + '\n'
+
+
+    def export(self):
+        """
+        Appends a JSON line and rewrites the Prometheus file, for the paths that were given.
+        """
+        if not self.enabled:
+            return
+        if self.JSON_PATH is not None:
+            with open(self.JSON_PATH, 'a') as f:
+                f.write(json.dumps(self.summary()) + '\n')
+        if self.PROMETHEUS_PATH is not None:
+            #Renamed over the old file so a scraper never reads a partial one
+            tmp_path = self.PROMETHEUS_PATH + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(self.prometheus())
+            os.replace(tmp_path, self.PROMETHEUS_PATH)
+        self.last_export = time.perf_counter()
+
+
+    def tick(self):
+        """
+        Exports if the interval has passed since the last export, to be called once per episode.
+        """
+        if self.enabled and time.perf_counter() - self.last_export >= self.INTERVAL:
+            self.export()
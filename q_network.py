@@ -1,11 +1,15 @@
-from keras import models, layers, optimizers, activations, losses
+import numpy as np
+import tensorflow as tf
+from keras import models, layers, optimizers, activations, losses, initializers
+
+from numpy_network import mlp_forward
 
 
 class QNetwork:
     """
     Represents the DQN's Neural Network.
     """
-    def __init__(self, input_shape, hidden_units, output_size, learning_rate=0.01): 
+    def __init__(self, input_shape, hidden_units, output_size, learning_rate=0.01, seed=None): 
         """
         Params of the Neural Network.
 
@@ -17,12 +21,16 @@ class QNetwork:
         :type output_size: int
         :param learning_rate: learning rate of the action-value neural network.
         :type learning_rate: float.
+        :param seed: seed of the initial weights.
+        :type seed: int.
         """
+        self.seed = seed
         self.input_shape = input_shape
         self.hidden_units = hidden_units
         self.output_size = output_size
         self.learning_rate = learning_rate
         self.model = self.make_model()
+        self.weights = None     #NumPy snapshot of the weights for fast inference, refreshed by train()
 
 
     def make_model(self):
@@ -34,13 +42,15 @@ class QNetwork:
         """
         model = models.Sequential() 
 
-        model.add(layers.Dense(self.hidden_units[0], activation=activations.linear, input_dim=self.input_shape))
+        #One seed per layer, so that the layers do not get the same weights
+        seeds = [None]*4 if self.seed is None else [self.seed + i for i in range(4)]
+        model.add(layers.Dense(self.hidden_units[0], activation=activations.linear, input_dim=self.input_shape, kernel_initializer=initializers.GlorotUniform(seeds[0])))
         model.add(layers.ReLU())
-        model.add(layers.Dense(self.hidden_units[1], activation=activations.linear))
+        model.add(layers.Dense(self.hidden_units[1], activation=activations.linear, kernel_initializer=initializers.GlorotUniform(seeds[1])))
         model.add(layers.ReLU())
-        model.add(layers.Dense(self.hidden_units[2], activation=activations.linear))
+        model.add(layers.Dense(self.hidden_units[2], activation=activations.linear, kernel_initializer=initializers.GlorotUniform(seeds[2])))
         model.add(layers.ReLU())
-        model.add(layers.Dense(self.output_size, activation=activations.linear))
+        model.add(layers.Dense(self.output_size, activation=activations.linear, kernel_initializer=initializers.GlorotUniform(seeds[3])))
 
         model.compile(loss=losses.mse, optimizer=optimizers.Adam(lr=self.learning_rate))
         model.summary()
@@ -54,13 +64,77 @@ class QNetwork:
         
         :param state: current state.
         :type state: NumPy array with dimension (1, 18).
-        :param batch_size size of the minibatch taken from the replay buffer.
+        :param batch_size size of the minibatch taken from the replay buffer. The whole input is evaluated at once.
         :type batch_size: int.
         """
-        return self.model.predict(state, batch_size)
+        return self.forward(np.asarray(state, dtype=np.float32)).numpy()
+
+
+    def predict_numpy(self, state):
+        """
+        Evaluates the network directly in NumPy. Much faster than Keras for single states.
+
+        :param state: current state.
+        :type state: NumPy array with dimension (18,) or (N, 18).
+        :return: action-values.
+        :rtype: NumPy array with dimension (4,) or (N, 4).
+        """
+        if self.weights is None:
+            self.weights = self.model.get_weights()
+        return mlp_forward(self.weights, state)
+
+
+    def get_weights(self):
+        """
+        Returns the weights of the neural network.
+        """
+        return self.model.get_weights()
+
+
+    def set_weights(self, weights):
+        """
+        Replaces the weights of the neural network.
+
+        :param weights: weights of another network with the same layers.
+        :type weights: list of NumPy arrays.
+        """
+        self.model.set_weights(weights)
+        self.weights = None
+
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, None), dtype=tf.float32)])
+    def forward(self, states):
+        """
+        Compiled forward pass of the network, without the batching machinery of model.predict.
+
+        :param states: states to be evaluated.
+        :type states: Tensor with dimension (N, 18).
+        """
+        return self.model(states, training=False)
+
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, None), dtype=tf.float32)]*2 + [tf.TensorSpec(shape=(None,), dtype=tf.float32)])
+    def train_step(self, states, action_values, sample_weights):
+        """
+        Compiled gradient step on the whole batch, same update as one epoch of model.fit.
+
+        :param states: states taken from memory. 
+        :type states: Tensor with dimension (agent.BATCH_SIZE, 18).
+        :param action_values: values of the actions of the states.
+        :type action_values: Tensor with dimension (agent.BATCH_SIZE, 4).
+        :param sample_weights: weight of each state in the loss.
+        :type sample_weights: Tensor with dimension (agent.BATCH_SIZE,).
+        :return: loss and the updated weights, copied inside the graph, which is much faster than get_weights().
+        :rtype: Tensor, list of Tensors.
+        """
+        with tf.GradientTape() as tape:
+            loss = tf.reduce_mean(sample_weights*losses.mse(action_values, self.model(states, training=True)))
+        gradients = tape.gradient(loss, self.model.trainable_variables)
+        self.model.optimizer.apply_gradients(zip(gradients, self.model.trainable_variables))
+        return loss, [tf.identity(v) for v in self.model.weights]
     
 
-    def train(self, states, action_values, batch_size):
+    def train(self, states, action_values, batch_size, sample_weights=None):
         """
         Train the Neural Network.
 
@@ -68,10 +142,16 @@ class QNetwork:
         :type states: NumPy array with dimension (agen.BATCH/-SIZE, 18)
         :param action_values: values of the actions of the states
         :type action_values: NumPy array with dimension (agen.BATCH_SIZE, 4).
-        :param batch_size: size of the minibatch taken from the replay buffer.
+        :param batch_size: size of the minibatch taken from the replay buffer. The whole input is a single batch.
         :type batch_size: int
+        :param sample_weights: importance-sampling weights of the states, all 1 if None.
+        :type sample_weights: NumPy array with dimension (agent.BATCH_SIZE,).
         """
-        self.model.fit(states, action_values, batch_size=batch_size, verbose=0, epochs=1)
+        if sample_weights is None:
+            sample_weights = np.ones(len(states), dtype=np.float32)
+        _, weights = self.train_step(np.asarray(states, dtype=np.float32), np.asarray(action_values, dtype=np.float32),
+                                     np.asarray(sample_weights, dtype=np.float32))
+        self.weights = [w.numpy() for w in weights]     #act() always uses the weights of the last step
 
 
     def load(self, name):
@@ -82,6 +162,7 @@ class QNetwork:
         :type name: str.
         """
         self.model.load_weights(name)
+        self.weights = None
 
 
     def save(self, name):
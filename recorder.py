@@ -0,0 +1,222 @@
+import os
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+from environment import Snake_Env
+
+
+class EpisodeRecorder:
+    """
+    Logs the start of each episode, the actions and where the food appeared, enough to replay it exactly.
+    """
+    def __init__(self, env):
+        """
+        Creates an empty log.
+
+        :param env: game environment.
+        :type env: Class Snake_Env().
+        """
+        self.env = env
+        self.starts = []        #width, height, head x, head y, direction, food x, food y
+        self.actions = []
+        self.foods = []
+        self.action_counts = []
+        self.food_counts = []
+        self.scores = []
+        self.infos = []
+
+
+    def start(self):
+        """
+        Records the start of an episode, to be called right after env.reset().
+        """
+        head_x, head_y = self.env.SNAKE.head_pos()
+        self.starts.append((self.env.WIDTH, self.env.HEIGHT, head_x, head_y, self.env.VELOCITY, self.env.FOOD_X, self.env.FOOD_Y))
+        self.action_counts.append(0)
+        self.food_counts.append(0)
+
+
+    def step(self, action, done, info):
+        """
+        Records an action, to be called right after env.step(action).
+
+        :param action: action chosen by the agent.
+        :type action: int.
+        :param done: if the episode is over.
+        :type done: boolean.
+        :param info: info returned by the environment.
+        :type info: int.
+        """
+        self.actions.append(action)
+        self.action_counts[-1] += 1
+        if info == 2:       #the food moved
+            self.foods.append((self.env.FOOD_X, self.env.FOOD_Y))
+            self.food_counts[-1] += 1
+        if done:
+            self.scores.append(self.env.SNAKE.LENGTH - 4)
+            self.infos.append(info)
+
+
+    def save(self, path):
+        """
+        Saves the finished episodes.
+
+        :param path: file name.
+        :type path: str.
+        """
+        n = len(self.scores)
+        env = self.env
+        np.savez_compressed(path, board=np.array([env.MAX_WIDTH, env.MAX_HEIGHT, env.DISPLAY_WIDTH, env.DISPLAY_HEIGHT]),
+                            starts=np.array(self.starts[:n], dtype=np.int16).reshape(n, 7),
+                            action_counts=np.array(self.action_counts[:n], dtype=np.int64),
+                            actions=np.array(self.actions[:sum(self.action_counts[:n])], dtype=np.uint8),
+                            food_counts=np.array(self.food_counts[:n], dtype=np.int64),
+                            foods=np.array(self.foods[:sum(self.food_counts[:n])], dtype=np.int16).reshape(-1, 2),
+                            scores=np.array(self.scores, dtype=np.int16),
+                            infos=np.array(self.infos, dtype=np.int8))
+
+
+def load_episodes(path):
+    """
+    Reads the episodes saved by an EpisodeRecorder.
+
+    :param path: file name.
+    :type path: str.
+    :return: size of the board and display, and the episodes.
+    :rtype: tuple of int with dimension (1, 4), list of dict.
+    """
+    with np.load(path) as f:
+        action_ends, food_ends = np.cumsum(f['action_counts']), np.cumsum(f['food_counts'])
+        episodes = []
+        for i in range(len(f['scores'])):
+            episodes.append({'start': tuple(int(v) for v in f['starts'][i]),
+                             'actions': f['actions'][action_ends[i]-f['action_counts'][i]:action_ends[i]],
+                             'foods': f['foods'][food_ends[i]-f['food_counts'][i]:food_ends[i]],
+                             'score': int(f['scores'][i]),
+                             'info': int(f['infos'][i])})
+        return tuple(int(v) for v in f['board']), episodes
+
+
+def replay(env, episode):
+    """
+    Plays a recorded episode again.
+
+    :param env: game environment.
+    :type env: Class Snake_Env().
+    :param episode: episode returned by load_episodes().
+    :type episode: dict.
+    :return: yields each action after the environment took it.
+    :rtype: generator of int.
+    """
+    env.restore(*episode['start'])
+    foods = iter(episode['foods'])
+    done = False
+    for action in episode['actions']:
+        _, _, done, info = env.step(int(action))
+        if info == 2:
+            env.move_food(*(int(v) for v in next(foods)))
+        yield int(action)
+
+    if not done or env.SNAKE.LENGTH - 4 != episode['score']:
+        raise ValueError('The replay does not match the recorded episode.')
+
+
+def export_episode(board, episode, name, fps):
+    """
+    Replays an episode and writes its frames to a video (.mp4, .avi) or a GIF.
+
+    :param board: size of the board and display.
+    :type board: tuple of int with dimension (1, 4).
+    :param episode: episode returned by load_episodes().
+    :type episode: dict.
+    :param name: output file name, the extension chooses the format.
+    :type name: str.
+    :param fps: frames per second.
+    :type fps: int.
+    :return: output file name.
+    :rtype: str.
+    """
+    from renderer import Renderer
+
+    max_width, max_height, display_width, display_height = board
+    env = Snake_Env(max_width, max_height, max_width-2, max_height-2, display_width, display_height)
+    renderer = Renderer(max_width, max_height, display_width, display_height)
+
+    def frames():
+        for action in replay(env, episode):
+            head_x, head_y = env.SNAKE.head_pos()
+            yield renderer.draw(env.SNAKE.GRID[:-2], head_x, head_y, env.SNAKE.is_alive,
+                                env.FOOD_X, env.FOOD_Y, env.get_boundaries(), action)
+
+    if name.endswith('.gif'):
+        from PIL import Image
+        from environment import WHITE, FOOD_COLOR
+        from snake import BODY_COLOR, GREY, YELLOW
+        from utils import GREEN, RED
+
+        #The game only has a few colors, mapping them to a fixed palette is much faster than an adaptive one
+        palette = Image.new('P', (1, 1))
+        colors = [c for color in (WHITE, FOOD_COLOR, BODY_COLOR, GREY, YELLOW, GREEN, RED) for c in color[::-1]]     #BGR to RGB
+        palette.putpalette(colors + [0]*(768 - len(colors)))
+        images = (Image.fromarray(frame[..., ::-1]).quantize(palette=palette, dither=Image.Dither.NONE) for frame in frames())
+        first = next(images)
+        first.save(name, save_all=True, append_images=images, duration=int(1000/fps), loop=0, optimize=False)
+    else:
+        import cv2
+        writer = None
+        for frame in frames():
+            if writer is None:
+                fourcc = cv2.VideoWriter_fourcc(*('mp4v' if name.endswith('.mp4') else 'MJPG'))
+                writer = cv2.VideoWriter(name, fourcc, fps, (frame.shape[1], frame.shape[0]))
+            writer.write(frame)
+        writer.release()
+    return name
+
+
+def export(path, out_dir, indexes=None, min_score=None, fmt='gif', fps=30, processes=None):
+    """
+    Exports recorded episodes in parallel, one file per episode.
+
+    :param path: file saved by an EpisodeRecorder.
+    :type path: str.
+    :param out_dir: directory of the output files.
+    :type out_dir: str.
+    :param indexes: episodes to export, all if None.
+    :type indexes: list of int.
+    :param min_score: only export episodes with at least this score.
+    :type min_score: int.
+    :param fmt: 'gif', 'mp4' or 'avi'.
+    :type fmt: str.
+    :param fps: frames per second.
+    :type fps: int.
+    :param processes: number of processes, one per CPU if None.
+    :type processes: int.
+    :return: output file names.
+    :rtype: list of str.
+    """
+    board, episodes = load_episodes(path)
+    if indexes is None:
+        indexes = range(len(episodes))
+    if min_score is not None:
+        indexes = [i for i in indexes if episodes[i]['score'] >= min_score]
+    os.makedirs(out_dir, exist_ok=True)
+
+    jobs = [(board, episodes[i], os.path.join(out_dir, 'episode_{}.{}'.format(i, fmt)), fps) for i in indexes]
+    with mp.get_context('spawn').Pool(processes) as pool:
+        return pool.starmap(export_episode, jobs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export recorded episodes to video or GIF files.')
+    parser.add_argument('path', help='file saved by an EpisodeRecorder')
+    parser.add_argument('out_dir', help='directory of the output files')
+    parser.add_argument('--episodes', type=int, nargs='*', help='episodes to export, all by default')
+    parser.add_argument('--min-score', type=int, help='only export episodes with at least this score')
+    parser.add_argument('--format', default='gif', choices=('gif', 'mp4', 'avi'))
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+
+    for name in export(args.path, args.out_dir, args.episodes, args.min_score, args.format, args.fps, args.processes):
+        print(name)
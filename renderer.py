@@ -0,0 +1,130 @@
+import numpy as np
+
+from environment import WHITE, FOOD_COLOR
+from snake import BODY_COLOR, GREY, YELLOW
+from utils import display_action
+
+
+EXTRA_COLS = 10     #extra columns for the buttons, as in utils.add_info()
+
+
+class Renderer:
+    """
+    Draws the game into a persistent frame, repainting only the cells that changed since the previous frame.
+    """
+    def __init__(self, max_width, max_height, display_width, display_height):
+        """
+        Renderer params.
+
+        :param max_width: maximum width of the game border.
+        :type max_width: int.
+        :param max_height: maximum height of the game border.
+        :type max_height: int.
+        :param display_width: width of the display box.
+        :type display_width: int.
+        :param display_height: height of the display box.
+        :type display_height: int.
+        """
+        self.MAX_WIDTH = max_width
+        self.MAX_HEIGHT = max_height
+        self.backgrounds = {}       #board plus buttons, one per boundary size
+
+        #Small frame (one pixel per cell) and a view of the board inside it, cells are indexed by y*MAX_WIDTH + x
+        self.frame = np.empty((max_height, max_width + EXTRA_COLS, 3), dtype=np.uint8)
+        self.board = self.frame[:, 1:max_width+1]
+        self.boundaries = None
+        self.painted = np.zeros(max_width*max_height, dtype=bool)     #body cells in the frame
+        self.head, self.food = None, None
+
+        #Nearest-neighbour index maps to the display size, same output size as utils.add_info()
+        scale = int(display_width/max_width)
+        out_width = display_width + EXTRA_COLS*scale
+        self.ROWS = np.arange(display_height)*max_height//display_height
+        self.COLS = np.arange(out_width)*(max_width + EXTRA_COLS)//out_width
+        self.wide = np.empty((max_height, out_width, 3), dtype=np.uint8)
+        self.image = np.empty((display_height, out_width, 3), dtype=np.uint8)
+
+
+    def background(self, boundaries):
+        """
+        Returns the board with the play region and the buttons, built once per boundary size.
+
+        :param boundaries: boundaries of the game.
+        :type boundaries: tuple of int with dimension (1, 4).
+        :return: background of the board only (without the buttons) and of the whole frame.
+        :rtype: NumPy arrays with dimension (max_height*max_width, 3) and (max_height, max_width+10, 3).
+        """
+        if boundaries not in self.backgrounds:
+            x1, x2, y1, y2 = boundaries
+            frame = np.full(self.frame.shape, 255, dtype=np.uint8)     #white background
+            frame[:, 1:self.MAX_WIDTH+1] = 0
+            frame[y1:y2+1, x1+1:x2+2] = WHITE
+            frame = display_action(frame, -1, self.MAX_HEIGHT)
+            board = np.ascontiguousarray(frame[:, 1:self.MAX_WIDTH+1]).reshape(-1, 3)
+            self.backgrounds[boundaries] = board, frame
+        return self.backgrounds[boundaries]
+
+
+    def paint(self, cell, board):
+        """
+        Restores a cell to the body color or to the background.
+
+        :param cell: index of the cell.
+        :type cell: int.
+        :param board: background of the board.
+        :type board: NumPy array with dimension (max_height*max_width, 3).
+        """
+        self.board[cell//self.MAX_WIDTH, cell%self.MAX_WIDTH] = BODY_COLOR if self.painted[cell] else board[cell]
+
+
+    def draw(self, occupancy, head_x, head_y, is_alive, food_x, food_y, boundaries, action):
+        """
+        Updates the frame and scales it to the display size.
+
+        :param occupancy: number of body parts on each cell.
+        :type occupancy: NumPy array with dimension (max_height*max_width,).
+        :param head_x: head x position.
+        :type head_x: int.
+        :param head_y: head y position.
+        :type head_y: int.
+        :param is_alive: if the snake is alive.
+        :type is_alive: boolean.
+        :param food_x: food x position.
+        :type food_x: int.
+        :param food_y: food y position.
+        :type food_y: int.
+        :param boundaries: boundaries of the game.
+        :type boundaries: tuple of int with dimension (1, 4).
+        :param action: action chosen by the agent.
+        :type action: int.
+        :return: image of the game, reused by the next call.
+        :rtype: NumPy array with dimension (display_height, display_width + 10*scale, 3).
+        """
+        board, frame = self.background(boundaries)
+        if boundaries != self.boundaries:       #new board size, start from a clean frame
+            self.frame[:] = frame
+            self.painted[:] = False
+            self.boundaries, self.head, self.food = boundaries, None, None
+
+        #Body cells that appeared or disappeared since the last frame
+        body = occupancy > 0
+        changed = np.flatnonzero(body != self.painted)
+        self.painted[changed] = body[changed]
+        rows, cols = np.divmod(changed, self.MAX_WIDTH)
+        self.board[rows, cols] = np.where(body[changed, None], BODY_COLOR, board[changed])
+
+        #The old head and food cells go back to body or background, the food is drawn under the body
+        for cell in (self.head, self.food):
+            if cell is not None:
+                self.paint(cell, board)
+        self.head, self.food = head_y*self.MAX_WIDTH + head_x, food_y*self.MAX_WIDTH + food_x
+        if not self.painted[self.food]:
+            self.board[food_y, food_x] = FOOD_COLOR
+        self.board[head_y, head_x] = GREY if is_alive else YELLOW
+
+        display_action(self.frame, action, self.MAX_HEIGHT)
+
+        #Columns first on the small frame, then whole rows are copied
+        np.take(self.frame, self.COLS, axis=1, out=self.wide)
+        np.take(self.wide, self.ROWS, axis=0, out=self.image)
+        return self.image
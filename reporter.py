@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import queue
+import threading
+import subprocess
+
+from numpy_network import save_weights
+
+
+def read_metrics(path):
+    """
+    Reads the metrics streamed by a Reporter, one JSON line per episode. A partial last line is skipped.
+
+    :param path: metrics file.
+    :type path: str.
+    :return: metrics of each episode.
+    :rtype: list of dict.
+    """
+    metrics = []
+    with open(path) as f:
+        for line in f:
+            if not line.endswith('\n'):     #still being written
+                break
+            metrics.append(json.loads(line))
+    return metrics
+
+
+def plot_history(path, fig_format='png'):
+    """
+    Plots the training curves streamed by a Reporter. Can also be run offline: python reporter.py dqn_training_metrics.jsonl [png|svg]
+
+    :param path: metrics file with the return and score of each episode.
+    :type path: str.
+    :param fig_format: format of the figures.
+    :type fig_format: str.
+    """
+    import matplotlib
+    matplotlib.use('Agg')       #no display needed
+    import matplotlib.pyplot as plt
+
+    metrics = read_metrics(path)
+    for key, ylabel, name in (('return', 'Return', 'dqn_training_reward.'), ('score', 'Score', 'dqn_training_score.')):
+        fig = plt.figure()
+        plt.plot([m[key] for m in metrics], 'tab:blue')
+        plt.xlabel('Episode')
+        plt.ylabel(ylabel)
+        fig.savefig(name + fig_format, format=fig_format)
+        plt.close(fig)
+
+
+class Reporter:
+    """
+    Writes checkpoints and metrics in a background thread and plots them in a separate process,
+    so the episode loop never waits for the disk or matplotlib.
+    """
+    def __init__(self, metrics_path='dqn_training_metrics.jsonl', checkpoint_path='snake.h5', fig_format='png'):
+        """
+        Reporter params.
+
+        :param metrics_path: file where the metrics of each episode are appended, kept across runs.
+        :type metrics_path: str.
+        :param checkpoint_path: file where the weights are saved.
+        :type checkpoint_path: str.
+        :param fig_format: format of the figures.
+        :type fig_format: str.
+        """
+        self.METRICS_PATH = metrics_path
+        self.CHECKPOINT_PATH = checkpoint_path
+        self.FIG_FORMAT = fig_format
+        self.process = None
+        self.queue = queue.Queue()
+        self.metrics_file = open(self.METRICS_PATH, 'a')
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+
+    def log(self, metrics):
+        """
+        Streams the metrics of an episode to the metrics file.
+
+        :param metrics: values of the episode, e.g. {'episode': 1, 'return': -10.2, 'score': 0}.
+        :type metrics: dict.
+        """
+        self.queue.put(('log', metrics))
+
+
+    def checkpoint(self, weights):
+        """
+        Saves a snapshot of the weights. Only the latest snapshot is written if several are waiting.
+
+        :param weights: weights of the neural network, not modified afterwards (e.g. from get_weights()).
+        :type weights: list of NumPy arrays.
+        """
+        self.queue.put(('checkpoint', weights))
+
+
+    def flush(self, memory):
+        """
+        Writes a replay memory kept on disk (MappedReplayMemory) in the background. Adds made while it is
+        written are kept by the next flush.
+
+        :param memory: replay memory with a flush() method.
+        :type memory: MappedReplayMemory.
+        """
+        self.queue.put(('flush', memory))
+
+
+    def report(self):
+        """
+        Plots the metrics logged so far in the background. Skipped if the previous plot is not done yet.
+        """
+        self.queue.put(('report', None))
+
+
+    def work(self):
+        """
+        Background thread: handles the queued requests in order until close() is called.
+        """
+        while True:
+            requests = [self.queue.get()]
+            while not self.queue.empty():
+                requests.append(self.queue.get())
+            latest = max([i for i, (kind, _) in enumerate(requests) if kind == 'checkpoint'], default=None)
+
+            for i, (kind, value) in enumerate(requests):
+                if kind == 'log':
+                    self.metrics_file.write(json.dumps(value) + '\n')
+                elif kind == 'checkpoint' and i == latest:
+                    self.write_checkpoint(value)
+                elif kind == 'flush':
+                    value.flush()
+                elif kind == 'report':
+                    self.metrics_file.flush()
+                    if self.process is None or self.process.poll() is not None:
+                        self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), self.METRICS_PATH, self.FIG_FORMAT])
+                elif kind == 'close':
+                    self.metrics_file.close()
+                    return
+            self.metrics_file.flush()
+
+
+    def write_checkpoint(self, weights):
+        """
+        Writes the weights to a temporary file first, so the checkpoint is never left half written.
+
+        :param weights: weights of the neural network.
+        :type weights: list of NumPy arrays.
+        """
+        tmp_path = self.CHECKPOINT_PATH + '.tmp'
+        save_weights(tmp_path, weights)
+        os.replace(tmp_path, self.CHECKPOINT_PATH)
+
+
+    def close(self):
+        """
+        Waits for the queued requests to be written, then plots the final curves.
+        """
+        self.queue.put(('close', None))
+        self.thread.join()
+        if self.process is not None:
+            self.process.wait()
+            self.process = None
+        subprocess.run([sys.executable, os.path.abspath(__file__), self.METRICS_PATH, self.FIG_FORMAT])
+
+
+if __name__ == '__main__':
+    plot_history(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'png')
@@ -1,6 +1,5 @@
 import numpy as np 
-from collections import deque
-from random import randint
+from functools import lru_cache
 
 
 #BGR
@@ -8,11 +7,53 @@ YELLOW = (0,255,255)
 GREY = (100,100,100)
 BODY_COLOR = (0,0,0) #BLACK
 
+#Directions the snake looks at as (x, y): up, up/right, right, down/right, down, down/left, left, up/left
+DIRECTIONS = ((0,-1), (1,-1), (1,0), (1,1), (0,1), (-1,1), (-1,0), (-1,-1))
+
+
+@lru_cache(maxsize=4)
+def ray_tables(boundaries, max_width, max_height):
+    """
+    Precomputes the sensors of every cell inside the boundaries. Rebuilt only when the board size changes.
+
+    :param boundaries: boundaries of the game.
+    :type boundaries: tuple of int with dimension (1, 4).
+    :param max_width: maximum width of the game border.
+    :type max_width: int.
+    :param max_height: maximum height of the game border.
+    :type max_height: int.
+    :return: 1/distance to the wall of each cell and direction, grid indexes of the cells along each ray 
+                and 1/distance of each position along a ray (0 for the last one, which means no body found).
+    :rtype: NumPy arrays with dimension (max_height, max_width, 8), (max_height, max_width, 8, steps+1) and (steps+1,).
+    """
+    x1, x2, y1, y2 = boundaries
+    steps = max(x2-x1, y2-y1, 0)
+    empty, full = max_width*max_height, max_width*max_height+1    #extra grid cells, always empty and always full
+
+    wall = np.zeros((max_height, max_width, len(DIRECTIONS)))
+    rays = np.full((max_height, max_width, len(DIRECTIONS), steps+1), empty, dtype=np.intp)
+    rays[..., steps] = full
+    for y in range(y1, y2+1):
+        for x in range(x1, x2+1):
+            for d, (dx, dy) in enumerate(DIRECTIONS):
+                distance = 1
+                check_x, check_y = x + dx, y + dy
+                while check_y >= y1 and check_y <= y2 and check_x >= x1 and check_x <= x2:
+                    rays[y, x, d, distance-1] = check_y*max_width + check_x
+                    check_x += dx
+                    check_y += dy
+                    distance += 1
+                wall[y, x, d] = 1/distance
+
+    inverse = np.zeros(steps+1)
+    inverse[:steps] = 1/np.arange(1, steps+1)
+    return wall, rays, inverse
+
 class Snake:
     """
     Represents the snake.
     """
-    def __init__(self, x_start, y_start, env_width, env_height):
+    def __init__(self, x_start, y_start, env_width, env_height, max_width, max_height, direction=None, rng=None):
         """
         Snake params.
 
@@ -24,32 +65,58 @@ class Snake:
         :type env_width: int.            
         :param env_height: environment height.
         :type env_height: int.
+        :param max_width: maximum width of the game border.
+        :type max_width: int.
+        :param max_height: maximum height of the game border.
+        :type max_height: int.
+        :param direction: initial direction (0:left, 1:right, 2:up, 3:down), random if None.
+        :type direction: int.
+        :param rng: random generator for the initial direction, a new unseeded one if None.
+        :type rng: numpy.random.Generator.
         """
         self.ENV_WIDTH = env_width
         self.ENV_HEIGHT = env_height
+        self.MAX_WIDTH = max_width
+        self.MAX_HEIGHT = max_height
         
         #Generating random directions for initiating the snake
-        a = randint(0,3)
+        if direction is not None:
+            a = (1, 0, 3, 2)[direction]
+        else:
+            a = int((np.random.default_rng() if rng is None else rng).integers(0, 4))
         init_dir = 0 
         
         
         if a == 0:
-            self.X = deque([x_start, x_start-1, x_start -2, x_start-3])
-            self.Y = deque([y_start, y_start, y_start, y_start])
+            X = [x_start, x_start-1, x_start -2, x_start-3]
+            Y = [y_start, y_start, y_start, y_start]
             init_dir = 1
         elif a == 1:
-            self.X = deque([x_start, x_start+1, x_start+2, x_start+3])
-            self.Y = deque([y_start, y_start, y_start, y_start])
+            X = [x_start, x_start+1, x_start+2, x_start+3]
+            Y = [y_start, y_start, y_start, y_start]
             init_dir = 0
         elif a == 2:
-            self.Y = deque([y_start, y_start-1, y_start-2, y_start-3])
-            self.X = deque([x_start, x_start, x_start, x_start])
+            Y = [y_start, y_start-1, y_start-2, y_start-3]
+            X = [x_start, x_start, x_start, x_start]
             init_dir = 3
         else:
-            self.Y = deque([y_start, y_start+1, y_start+2, y_start+3])
-            self.X = deque([x_start, x_start, x_start, x_start])
+            Y = [y_start, y_start+1, y_start+2, y_start+3]
+            X = [x_start, x_start, x_start, x_start]
             init_dir = 2
        
+        #Circular buffers with the body positions, the head is at index HEAD and the tail LENGTH-1 positions behind
+        self.CAPACITY = max(8, 2*env_width*env_height)
+        self.BODY_X = [0]*self.CAPACITY
+        self.BODY_Y = [0]*self.CAPACITY
+        self.BODY_X[:4] = X[::-1]
+        self.BODY_Y[:4] = Y[::-1]
+        self.HEAD = 3
+
+        #Flattened occupancy grid, number of body parts on each cell, with two extra cells always empty and always full (see ray_tables)
+        self.GRID = np.zeros(max_width*max_height+2, dtype=np.int16)
+        self.GRID[-1] = 1
+        for x, y in zip(X, Y):
+            self.GRID[y*max_width + x] += 1
         self.is_alive = True 
         self.MOVES = max(100, env_width*env_height)
         self.LENGTH = 4
@@ -63,7 +130,7 @@ class Snake:
         :param env: represents the environment of the game.
         :type env: Class Snake_Env().
         """
-        for body_y, body_x in zip(self.Y, self.X):
+        for body_x, body_y in self.body():
             env[body_y, body_x] = BODY_COLOR
 
         head_x, head_y = self.head_pos()
@@ -80,8 +147,9 @@ class Snake:
         :param y_food: food y position.
         :type y_food: int.
         """
-        self.X.appendleft(x_food) 
-        self.Y.appendleft(y_food)
+        if self.LENGTH == self.CAPACITY:
+            self.grow()
+        self.push_head(x_food, y_food)
         self.LENGTH += 1
         self.MOVES += 100
 
@@ -95,26 +163,58 @@ class Snake:
         :param y_change: y position change value.
         :type y_change: int.
         """
-        #Updating snake's body position
-        for i in range(self.LENGTH-1,0,-1):
-            self.X[i] = self.X[i-1]
-            self.Y[i] = self.Y[i-1]
+        #The tail leaves its cell
+        tail = (self.HEAD - self.LENGTH + 1) % self.CAPACITY
+        self.GRID[self.BODY_Y[tail]*self.MAX_WIDTH + self.BODY_X[tail]] -= 1
 
-        #Updating head position
-        self.X[0] = self.X[0] + x_change
-        self.Y[0] = self.Y[0] + y_change
+        #The head moves to the new position, the rest of the body stays in place
+        head_x, head_y = self.head_pos()
+        self.push_head(head_x + x_change, head_y + y_change)
 
         self.MOVES -= 1
 
 
+    def push_head(self, x, y):
+        """
+        Add a new head in front of the body.
+
+        :param x: new head x position.
+        :type x: int.
+        :param y: new head y position.
+        :type y: int.
+        """
+        self.HEAD = (self.HEAD + 1) % self.CAPACITY
+        self.BODY_X[self.HEAD] = x
+        self.BODY_Y[self.HEAD] = y
+        self.GRID[y*self.MAX_WIDTH + x] += 1
+
+
+    def grow(self):
+        """
+        Double the capacity of the body buffers.
+        """
+        body = self.body()[::-1]
+        self.CAPACITY *= 2
+        self.BODY_X = [x for x, _ in body] + [0]*(self.CAPACITY - self.LENGTH)
+        self.BODY_Y = [y for _, y in body] + [0]*(self.CAPACITY - self.LENGTH)
+        self.HEAD = self.LENGTH - 1
+
+
+    def body(self):
+        """
+        Returns the body positions from the head to the tail.
+        :rtype: list of (int, int).
+        """
+        idx = [(self.HEAD - i) % self.CAPACITY for i in range(self.LENGTH)]
+        return [(self.BODY_X[i], self.BODY_Y[i]) for i in idx]
+
+
     def bit_itself(self):
         """
         Checks if the snake bit itself. 
         """
-        for i in range(1,self.LENGTH):
-            if self.X[0] == self.X[i] and self.Y[0] == self.Y[i]:
-                return True
-        return False
+        head_x, head_y = self.head_pos()
+        return self.GRID[head_y*self.MAX_WIDTH + head_x] > 1
 
     
     def is_on_body(self, check_x, check_y, remove_last=True):
@@ -128,15 +228,13 @@ class Snake:
         :param remove_last: remove the checked position from the lists. 
         :type remove_last: boolean
         """
-        X, Y = self.X.copy(), self.Y.copy()
-        
-        if remove_last:    #don't consider the last tail part
-            X.pop()
-            Y.pop()
-        for x,y in zip(X,Y):
-            if x == check_x and y == check_y:
-                return True
-        return False
+        if not (0 <= check_x < self.MAX_WIDTH and 0 <= check_y < self.MAX_HEIGHT):
+            return False
+        count = self.GRID[check_y*self.MAX_WIDTH + check_x]
+        tail = (self.HEAD - self.LENGTH + 1) % self.CAPACITY
+        if remove_last and check_x == self.BODY_X[tail] and check_y == self.BODY_Y[tail]:    #don't consider the last tail part
+            count -= 1
+        return count > 0
 
 
     def head_pos(self):
@@ -144,7 +242,7 @@ class Snake:
         Returns the head coordinates.
         :rtype: int, int.
         """
-        return self.X[0], self.Y[0]
+        return self.BODY_X[self.HEAD], self.BODY_Y[self.HEAD]
 
 
     def kill(self):
@@ -177,58 +275,12 @@ class Snake:
         :return: state of the environment.
         :rtype: NumPy array with dimension (1, 18).
         """
-        #Look up
-        up = self.lookInDirection(boundaries, y=-1, x=0)
-        #Look up/right
-        up_right = self.lookInDirection(boundaries, y=-1, x=1)
-        #Look right
-        right = self.lookInDirection(boundaries, y=0, x=1)
-        #Look down/right
-        down_right = self.lookInDirection(boundaries, y=1, x=1)
-        #Look down
-        down = self.lookInDirection(boundaries, y=1, x=0)
-        #Look down/left
-        down_left = self.lookInDirection(boundaries, y=1, x=-1)
-        #Look left
-        left = self.lookInDirection(boundaries, y=0, x=-1)
-        #Look up/left
-        up_left = self.lookInDirection(boundaries, y=-1, x=-1)
-
+        wall, rays, inverse = ray_tables(tuple(boundaries), self.MAX_WIDTH, self.MAX_HEIGHT)
         head_x, head_y = self.head_pos()
-        food_position = np.array([head_x - x_food, head_y - y_food])
-        return np.hstack((food_position, up, up_right, right, down_right, down, down_left, left, up_left))
-        #array of size 2*8 + 2 = 18
-	
-
-    def lookInDirection(self, boundaries, y, x):
-        """
-        Look in a specific direction.
 
-        :param boundaries: boundaries of the game.
-        :type boundaries: list of int with dimension (1, 4).
-        :param y: direction to look further in y-axis. 
-        :type y: int.
-        :param x: direction look further in x-axis.
-        :type x: int.
-        :return: NumPy array with the value of 1/distance to the wall or tail and 
-                    distance to the tail if it is in the direction.
-        :rtype: NumPy array with dimension (1, 2).
-        """
-        tail_distance = 0   # 0 if tail is not in this direction
-        distance = 1        #starting with 1 as it is the min distance of wall
-
-        curr_x, curr_y = self.head_pos()
-        check_x, check_y = curr_x + x, curr_y + y       #look one step further in the direction
-        x1, x2, y1, y2 = boundaries
-
-        while check_y >= y1 and check_y <= y2 and check_x >= x1 and check_x <= x2:
-
-            if tail_distance==0 and (self.is_on_body(check_x, check_y, remove_last = False)):
-                tail_distance = (1/distance)
-
-            check_y += y
-            check_x += x
-            
-            distance += 1
-        
-        return np.array([1/distance, tail_distance])
\ No newline at end of file
+        state = np.empty(18)      #array of size 2*8 + 2 = 18
+        state[0] = head_x - x_food
+        state[1] = head_y - y_food
+        state[2::2] = wall[head_y, head_x]
+        state[3::2] = inverse[(self.GRID[rays[head_y, head_x]] > 0).argmax(axis=1)]   #first body part along each ray
+        return state
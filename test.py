@@ -5,19 +5,22 @@ from time import sleep
 
 from agent import DeepQ_agent
 from environment import Snake_Env
+from recorder import EpisodeRecorder
 
 
 fig_format = 'png'
 #fig_format = 'svg'
+SEED = 0        #evaluation episodes are the same at every run
 
 #Creating the environment
 max_env_width, max_env_height = 27, 27
 env_width, env_height = max_env_width-2, max_env_height-2
 display_width, display_height = max_env_width * 18, max_env_height * 18
-env = Snake_Env(max_env_width, max_env_height, env_width, env_height, display_width, display_height)
+env_seed, agent_seed = np.random.SeedSequence(SEED).spawn(2)
+env = Snake_Env(max_env_width, max_env_height, env_width, env_height, display_width, display_height, seed = env_seed)
 
 #Creating the DQN agent (with greedy policy, suited for evaluation)
-agent = DeepQ_agent(env, hidden_units=(32, 18, 10))
+agent = DeepQ_agent(env, hidden_units=(32, 18, 10), backend='numpy', seed=agent_seed)
 
 #Checking if weights from previous learning session exists
 if os.path.exists('snake.h5'):
@@ -30,17 +33,20 @@ else:
 NUM_EPISODES = 30
 score_history = []
 return_history = []
+recorder = EpisodeRecorder(env)     #the episodes can be exported later with: python recorder.py dqn_evaluation_episodes.npz videos
 
 #Testing the agent
 for i in range(NUM_EPISODES):
     state = env.reset()
+    recorder.start()
     env.render(0)
     cumulative_reward = 0.0
 
     while True:
         #Decide action for present state
         action = agent.act(state)
-        state, reward, done, _ = env.step(action)
+        state, reward, done, info = env.step(action)
+        recorder.step(action, done, info)
         #Rendering the environment
         env.render(action)
         cumulative_reward = cumulative_reward * agent.GAMMA + reward
@@ -52,22 +58,21 @@ for i in range(NUM_EPISODES):
     return_history.append(cumulative_reward)
     print('iter: {}/{}, score: {}, cumulative reward: {:.3f}'.format(i+1, NUM_EPISODES, agent.env.SNAKE.LENGTH - 4, cumulative_reward))
 
+recorder.save('dqn_evaluation_episodes.npz')
+
 #Prints mean reward and mean score
 print('Mean reward: {:.3f}'.format(np.mean(return_history)))
 print('Mean score: {:.3f}'.format(np.mean(score_history)))
 
-#Plots return history
-plt.plot(return_history)
-plt.xlabel('Episode')
-plt.ylabel('Return')
-plt.savefig('dqn_evaluation_reward.' + fig_format, fig_format=fig_format)
-
-#Plot score history
-plt.figure()
-plt.plot(score_history)
-plt.xlabel('Episode')
-plt.ylabel('Score')
-plt.savefig('dqn_evaluation_score.' + fig_format, fig_format=fig_format)
+#Plots return and score history
+figures = []
+for history, ylabel, name in ((return_history, 'Return', 'dqn_evaluation_reward.'), (score_history, 'Score', 'dqn_evaluation_score.')):
+    fig = plt.figure()
+    plt.plot(history)
+    plt.xlabel('Episode')
+    plt.ylabel(ylabel)
+    fig.savefig(name + fig_format, format=fig_format)
+    figures.append(fig)
 plt.show()
-
-plt.show()
\ No newline at end of file
+for fig in figures:
+    plt.close(fig)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from agent import DeepQ_agent, double_dqn_targets
+from environment import Snake_Env
+
+
+GAMMA = 0.95
+
+
+def reference_targets(target, target_next, target_val, actions, rewards, dones, gamma):
+    """
+    Per-sample Bellman update of DeepQ_agent.learn before it was vectorized.
+    """
+    max_action_values = np.argmax(target_next, axis=1)
+    for i in range(len(target)):
+        if dones[i]:
+            target[i][actions[i]] = rewards[i]
+        else:
+            target[i][actions[i]] = rewards[i] + gamma*target_val[i][max_action_values[i]]
+    return target
+
+
+@pytest.mark.parametrize('reward_dtype', [np.float32, np.float64])
+@pytest.mark.parametrize('seed', range(5))
+def test_double_dqn_targets_match_the_loop(reward_dtype, seed):
+    rng = np.random.default_rng(seed)
+    n = 1024
+    target = rng.standard_normal((n, 4)).astype(np.float32)
+    target_next = rng.standard_normal((n, 4)).astype(np.float32)
+    target_val = (30*rng.standard_normal((n, 4))).astype(np.float32)
+    actions = rng.integers(0, 4, n).astype(np.int8)
+    rewards = rng.choice([-1.0, 50.0, -50.0], n).astype(reward_dtype)
+    dones = rng.random(n) < 0.1
+
+    expected = reference_targets(target.copy(), target_next, target_val, actions, rewards, dones, GAMMA)
+    vectorized = target.copy()
+    double_dqn_targets(vectorized, target_next, target_val, actions, rewards, dones, GAMMA)
+
+    assert vectorized.dtype == expected.dtype
+    np.testing.assert_array_equal(vectorized, expected)
+
+
+def test_td_errors():
+    target = np.zeros((3, 4), dtype=np.float32)
+    target_val = np.array([[1, 2, 3, 4]]*3, dtype=np.float32)
+    target_next = np.array([[0, 0, 0, 1]]*3, dtype=np.float32)      #selects the last action
+    td_errors = double_dqn_targets(target, target_next, target_val, np.array([0, 1, 2]), np.array([-1.0, 50.0, -50.0], dtype=np.float32),
+                                   np.array([False, False, True]), GAMMA)
+
+    np.testing.assert_allclose(td_errors, [-1 + GAMMA*4, 50 + GAMMA*4, -50], rtol=1e-6)
+    np.testing.assert_allclose(target[[0, 1, 2], [0, 1, 2]], td_errors, rtol=1e-6)
+
+
+@pytest.mark.parametrize('options', [{'prioritized': True, 'compact_memory': True},
+                                     {'memory_path': 'replay', 'trajectory_memory': True},
+                                     {'compact_memory': True, 'trajectory_memory': True}])
+def test_only_one_memory_option(options):
+    env = Snake_Env(27, 27, 10, 10, 1, 1, seed=0)
+    with pytest.raises(ValueError):
+        DeepQ_agent(env, hidden_units=(32, 18, 10), backend='numpy', seed=0, **options)
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from environment import Snake_Env
+from vec_environment import Snake_VecEnv
+
+
+MAX_SIZE = 27
+SIZES = [5, 10, 17, 25]
+DIRECTIONS = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+
+
+def reference_look(body, x_food, y_food, boundaries):
+    """
+    Snake.look as it was first written: walks each direction until the wall, checking every body part.
+    """
+    head_x, head_y = body[0]
+    x1, x2, y1, y2 = boundaries
+    state = [head_x - x_food, head_y - y_food]
+    for dx, dy in DIRECTIONS:
+        tail_distance, distance = 0, 1
+        check_x, check_y = head_x + dx, head_y + dy
+        while y1 <= check_y <= y2 and x1 <= check_x <= x2:
+            if tail_distance == 0 and (check_x, check_y) in body:
+                tail_distance = 1/distance
+            check_x += dx
+            check_y += dy
+            distance += 1
+        state += [1/distance, tail_distance]
+    return np.array(state)
+
+
+def policy(state, rng):
+    """
+    Goes to the food most of the time, so the snakes grow and end up biting themselves.
+    """
+    if rng.random() < 0.2:
+        return int(rng.integers(4))
+    dx, dy = state[0], state[1]     #head minus food
+    if dx != 0 and (dy == 0 or rng.random() < 0.5):
+        return 0 if dx > 0 else 1
+    return 2 if dy > 0 else 3
+
+
+def vec_body(venv, i):
+    """
+    Body of game i of a vectorized environment, from the head to the tail.
+    """
+    idx = [(venv.HEAD[i] - k) % venv.CAPACITY for k in range(venv.LENGTH[i])]
+    return [(int(venv.BODY_X[i, j]), int(venv.BODY_Y[i, j])) for j in idx]
+
+
+def sync(venv, env, i):
+    """
+    Copies a scalar game into game i of a vectorized environment.
+    """
+    body = env.SNAKE.body()
+    venv.OCCUPANCY[i] = 0
+    for k, (x, y) in enumerate(body):
+        venv.BODY_X[i, len(body)-1-k], venv.BODY_Y[i, len(body)-1-k] = x, y
+        venv.OCCUPANCY[i, y, x] += 1
+    venv.HEAD[i], venv.LENGTH[i], venv.MOVES[i] = len(body)-1, env.SNAKE.LENGTH, env.SNAKE.MOVES
+    venv.VELOCITY[i], venv.FOOD_X[i], venv.FOOD_Y[i] = env.VELOCITY, env.FOOD_X, env.FOOD_Y
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_look_matches_reference(size):
+    rng = np.random.default_rng(size)
+    env = Snake_Env(MAX_SIZE, MAX_SIZE, size, size, 1, 1, seed=size)
+    infos = set()
+    for _ in range(40):
+        state = env.reset()
+        np.testing.assert_array_equal(state, reference_look(env.SNAKE.body(), env.FOOD_X, env.FOOD_Y, env.get_boundaries()))
+        done = False
+        while not done:
+            state, _, done, info = env.step(policy(state, rng))
+            infos.add(info)
+            np.testing.assert_array_equal(state, reference_look(env.SNAKE.body(), env.FOOD_X, env.FOOD_Y, env.get_boundaries()))
+    assert {1, 2, 3} <= infos       #bites, foods and walls were all checked
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_vec_env_matches_scalar_env(size):
+    rng = np.random.default_rng(size)
+    env = Snake_Env(MAX_SIZE, MAX_SIZE, size, size, 1, 1, seed=size)
+    venv = Snake_VecEnv(1, MAX_SIZE, MAX_SIZE, size, size, 1, 1, seed=size)
+    infos = set()
+    for _ in range(40):
+        state = env.reset()
+        venv.reset()
+        sync(venv, env, 0)
+        np.testing.assert_array_equal(venv.look(venv.ENVS)[0], state)
+        done = False
+        while not done:
+            action = policy(state, rng)
+            state, reward, done, info = env.step(action)
+            vec_states, rewards, dones, vec_infos = venv.step(np.array([action]))
+            if info == 2:       #the foods are drawn from different streams
+                venv.FOOD_X[0], venv.FOOD_Y[0] = env.FOOD_X, env.FOOD_Y
+                vec_states = venv.look(venv.ENVS)
+            infos.add(info)
+
+            assert (rewards[0], dones[0], vec_infos[0]) == (reward, done, info)
+            if done and info == 2:      #bit itself on the food, the new food was already drawn by the vectorized game
+                np.testing.assert_array_equal(venv.FINAL_STATE[0, 2:], state[2:])
+            else:
+                np.testing.assert_array_equal(venv.FINAL_STATE[0] if done else vec_states[0], state)
+            if done:
+                assert venv.FINAL_LENGTH[0] == env.SNAKE.LENGTH
+            else:
+                assert vec_body(venv, 0) == env.SNAKE.body()
+    assert {1, 2, 3} <= infos
+
+
+def test_vec_env_look_matches_reference_after_resets():
+    rng = np.random.default_rng(0)
+    venv = Snake_VecEnv(64, MAX_SIZE, MAX_SIZE, 17, 17, 1, 1, seed=0)
+    states = venv.reset()
+    finished = 0
+    for _ in range(300):
+        states, _, dones, _ = venv.step(np.array([policy(state, rng) for state in states]))
+        finished += dones.sum()
+        for i in range(venv.NUM_ENVS):      #reset games included
+            expected = reference_look(vec_body(venv, i), venv.FOOD_X[i], venv.FOOD_Y[i], venv.get_boundaries())
+            np.testing.assert_array_equal(states[i], expected)
+    assert finished > 0
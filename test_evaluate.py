@@ -0,0 +1,37 @@
+import numpy as np
+
+import evaluate
+from numpy_network import NumpyQNetwork
+from vec_environment import Snake_VecEnv
+
+
+BOARDS = {}     #initial board of each episode played by the last RecordingVecEnv
+
+
+class RecordingVecEnv(Snake_VecEnv):
+    """
+    Keeps the initial board of every episode.
+    """
+    def reset(self, mask=None):
+        states = super().reset(mask)
+        for i in (self.ENVS if mask is None else np.flatnonzero(mask)):
+            board = (tuple(self.BODY_X[i, :4]), tuple(self.BODY_Y[i, :4]), int(self.FOOD_X[i]), int(self.FOOD_Y[i]))
+            BOARDS.setdefault(int(self.EPISODE[i]), board)
+        return states
+
+
+def initial_boards(monkeypatch, weights, num_episodes, num_envs):
+    BOARDS.clear()
+    monkeypatch.setattr(evaluate, 'Snake_VecEnv', RecordingVecEnv)
+    scores, lengths, infos = evaluate.play(weights, num_episodes, num_envs, 7)
+    assert len(scores) == len(lengths) == len(infos) == num_episodes and (lengths > 0).all()
+    return {episode: board for episode, board in BOARDS.items() if episode < num_episodes}
+
+
+def test_every_network_plays_the_same_episodes(monkeypatch):
+    first = NumpyQNetwork(18, (32, 18, 10), 4, seed=0).get_weights()
+    second = NumpyQNetwork(18, (32, 18, 10), 4, seed=1).get_weights()
+    boards = initial_boards(monkeypatch, first, 60, 8)
+    assert sorted(boards) == list(range(60))
+    assert initial_boards(monkeypatch, second, 60, 8) == boards
+    assert initial_boards(monkeypatch, second, 60, 3) == boards     #whichever game plays the episode
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from environment import Snake_Env
+from memory import encode_states, decode_states, ReplayMemory, CompactReplayMemory, TrajectoryReplayMemory
+
+
+MAX_SIZE = 27
+GAMMA = 0.95
+
+
+def play(size, num_steps, seed):
+    """
+    Experiences of random games, in the order an agent adds them to its memory.
+    """
+    env = Snake_Env(MAX_SIZE, MAX_SIZE, size, size, 1, 1, seed=seed)
+    rng = np.random.default_rng(seed)
+    experiences = []
+    state = env.reset()
+    for _ in range(num_steps):
+        action = int(rng.integers(4))
+        next_state, reward, done, _ = env.step(action)
+        experiences.append((state, action, reward, next_state, done))
+        state = env.reset() if done else next_state
+    return experiences
+
+
+@pytest.mark.parametrize('size', [5, 10, 25])
+def test_codec_round_trip(size):
+    states = np.array([experience[0] for experience in play(size, 2000, size)])
+    codes = encode_states(states)
+    assert codes.dtype == np.int8
+    np.testing.assert_array_equal(decode_states(codes, np.zeros(states.shape, dtype=np.float32)), states.astype(np.float32))
+
+
+@pytest.mark.parametrize('feature, value', [(0, 0.5), (1, 200), (0, -129), (2, -0.5), (5, 1/300)])
+def test_codec_rejects_what_it_cannot_encode(feature, value):
+    state = np.zeros(18)
+    state[feature] = value
+    with pytest.raises(ValueError):
+        encode_states(state)
+
+
+def test_compact_memory_matches_uniform_memory():
+    experiences = play(10, 500, 0)
+    uniform, compact = ReplayMemory(300, 32), CompactReplayMemory(300, 32)
+    for experience in experiences[:200]:
+        uniform.add(*experience)
+        compact.add(*experience)
+    for memory in (uniform, compact):       #wraps around the buffer
+        memory.add_batch(*(np.array(column) for column in zip(*experiences[200:])))
+
+    idx = np.random.default_rng(0).choice(len(uniform), size=32, replace=False)
+    for expected, actual in zip(uniform.gather(idx, 18), compact.gather(idx, 18)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def reference_nstep(experiences, h, n, gamma):
+    """
+    N-step return of the h-th experience added, walking the list of experiences one by one.
+    """
+    total, k = 0.0, 0
+    while k < n and h + k < len(experiences):
+        _, _, reward, next_state, done = experiences[h + k]
+        total += gamma**k*float(np.float32(reward))     #rewards are stored as float32
+        k += 1
+        if done:
+            break
+    return total, next_state, done, k
+
+
+@pytest.mark.parametrize('n', [1, 3, 10])
+def test_nstep_returns_match_reference(n):
+    memory = TrajectoryReplayMemory(64, 16, rng=np.random.default_rng(n))
+    experiences, added = [], {}     #experiences in order and the one that starts at each position
+    for experience in play(6, 400, n):
+        memory.add(*experience)
+        added[(memory.position - 1) % memory.BUFFER_SIZE] = len(experiences)
+        experiences.append(experience)
+        if len(memory) < 2*memory.BATCH_SIZE:
+            continue
+
+        memory.sample(18)
+        returns, positions, dones, steps = memory.nstep_returns(n, GAMMA)
+        for i, position in enumerate(memory.batch_indices):
+            total, next_state, done, k = reference_nstep(experiences, added[position], n, GAMMA)
+            assert (steps[i], dones[i]) == (k, done)
+            assert returns[i] == pytest.approx(total, rel=1e-5, abs=1e-6)     #discounted rewards are float32
+            np.testing.assert_array_equal(memory.observations[positions[i]], np.asarray(next_state, dtype=np.float32))
+    assert len(experiences) > 4*memory.BUFFER_SIZE and sum(e[4] for e in experiences) > 10    #wrapped, several episodes
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+keras = pytest.importorskip('keras')
+if int(keras.__version__.split('.')[0]) > 2:
+    pytest.skip('q_network.py is written for Keras 2', allow_module_level=True)
+from q_network import QNetwork
+
+
+def test_predict_numpy_follows_every_train_step():
+    rng = np.random.default_rng(0)
+    network = QNetwork(18, (32, 18, 10), 4, seed=0)
+    states = rng.standard_normal((256, 18)).astype(np.float32)
+    for _ in range(5):
+        batch = rng.standard_normal((64, 18)).astype(np.float32)
+        network.predict_numpy(batch)        #snapshot taken before the step
+        network.train(batch, rng.standard_normal((64, 4)).astype(np.float32), batch_size=64)
+
+        for snapshot, weights in zip(network.weights, network.get_weights()):
+            np.testing.assert_array_equal(snapshot, weights)
+        np.testing.assert_allclose(network.predict_numpy(states), network.model.predict(states, verbose=0), rtol=1e-5, atol=1e-5)
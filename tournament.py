@@ -0,0 +1,193 @@
+import os
+import glob
+import json
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+from numpy_network import load_weights
+from vec_environment import Snake_VecEnv
+from evaluate import max_env_width, max_env_height, env_width, env_height, display_width, display_height, summarize
+
+
+#Tournament settings
+NUM_EPISODES = 1000
+NUM_ENVS = 64           #games played at the same time by each model in each process
+SEED = 0
+Z = 1.96                #95% confidence intervals
+
+
+def stack_weights(models):
+    """
+    Stacks the weights of several networks so that they can be evaluated in one batched pass.
+
+    Networks with fewer units in a layer are padded with zero weights, which gives exactly the same outputs
+    (the extra units are always 0 after the ReLU and nothing reads them).
+
+    :param models: weights of each network, with the same number of layers.
+    :type models: list of lists of NumPy arrays.
+    :return: kernels with dimension (K, in, out) and biases with dimension (K, 1, out), in order.
+    :rtype: list of NumPy arrays.
+    """
+    if len(set(len(weights) for weights in models)) > 1:
+        raise ValueError('All the networks must have the same number of layers.')
+
+    stacked = []
+    for i in range(0, len(models[0]), 2):
+        fan_in = max(weights[i].shape[0] for weights in models)
+        fan_out = max(weights[i].shape[1] for weights in models)
+        kernels = np.zeros((len(models), fan_in, fan_out), dtype=np.float32)
+        biases = np.zeros((len(models), 1, fan_out), dtype=np.float32)
+        for k, weights in enumerate(models):
+            kernel, bias = weights[i], weights[i+1]
+            kernels[k, :kernel.shape[0], :kernel.shape[1]] = kernel
+            biases[k, 0, :bias.shape[0]] = bias
+        stacked += [kernels, biases]
+    return stacked
+
+
+def stacked_forward(stacked, states):
+    """
+    Evaluates K networks, each on its own batch of states.
+
+    :param stacked: weights returned by stack_weights().
+    :type stacked: list of NumPy arrays.
+    :param states: states of the games of each network.
+    :type states: NumPy array with dimension (K, N, 18).
+    :return: action-values.
+    :rtype: NumPy array with dimension (K, N, 4).
+    """
+    x = states
+    for i in range(0, len(stacked)-2, 2):     #Dense + ReLU layers
+        x = np.maximum(x @ stacked[i] + stacked[i+1], 0)
+    return x @ stacked[-2] + stacked[-1]
+
+
+def play(stacked, num_episodes, num_envs, seed):
+    """
+    Plays the same episodes with every network, greedily, in one batch of games. Episode i is seeded
+    with (seed, i) for all the networks, so they all get the same boards, and the same food sequence
+    as long as they eat the same number of foods.
+
+    The K forwards of a step are one batched matmul per layer, but every network still plays its own games,
+    so the time is spent stepping K*num_envs games: K networks take about K/2 times as long as one
+    (4.5x for 8 networks), not the time of one.
+
+    :param stacked: weights returned by stack_weights().
+    :type stacked: list of NumPy arrays.
+    :param num_episodes: number of episodes played by each network.
+    :type num_episodes: int.
+    :param num_envs: games played at the same time by each network.
+    :type num_envs: int.
+    :param seed: seed of the episodes.
+    :type seed: int or numpy.random.SeedSequence.
+    :return: score and length of each episode and network.
+    :rtype: NumPy int arrays with dimension (K, num_episodes).
+    """
+    num_models = stacked[0].shape[0]
+    num_envs = max(1, min(num_envs, num_episodes))
+    models = np.repeat(np.arange(num_models), num_envs)     #the games of a network form a group
+    env = Snake_VecEnv(num_models*num_envs, max_env_width, max_env_height, env_width, env_height, display_width, display_height, seed, models)
+    scores = np.zeros((num_models, num_episodes), dtype=np.int64)
+    lengths = np.zeros((num_models, num_episodes), dtype=np.int64)
+    steps = np.zeros(len(models), dtype=np.int64)
+
+    #A game takes the next episode of its network when it finishes, until all the episodes are played
+    states = env.reset()
+    while (env.EPISODE < num_episodes).any():
+        episodes = env.EPISODE.copy()
+        action_values = stacked_forward(stacked, states.reshape(num_models, num_envs, -1).astype(np.float32))
+        states, _, dones, _ = env.step(np.argmax(action_values, axis=2).ravel())
+        steps += 1
+
+        finished = np.flatnonzero(dones & (episodes < num_episodes))
+        scores[models[finished], episodes[finished]] = env.FINAL_LENGTH[finished] - 4
+        lengths[models[finished], episodes[finished]] = steps[finished]
+        steps[dones] = 0
+
+    return scores, lengths
+
+
+def tournament(paths, num_episodes=NUM_EPISODES, processes=1, num_envs=NUM_ENVS, seed=SEED):
+    """
+    Evaluates several checkpoints on the same episodes and ranks them by mean score.
+
+    :param paths: Keras HDF5 files with the weights.
+    :type paths: list of str.
+    :param num_episodes: number of episodes played by each checkpoint.
+    :type num_episodes: int.
+    :param processes: number of processes.
+    :type processes: int.
+    :param num_envs: games played at the same time by each checkpoint in each process.
+    :type num_envs: int.
+    :param seed: seed of the episodes.
+    :type seed: int.
+    :return: one entry per checkpoint, best first.
+    :rtype: list of dict.
+    :raises ValueError: if there is no checkpoint.
+    """
+    if not paths:
+        raise ValueError('No checkpoint to play.')
+    stacked = stack_weights([load_weights(path) for path in paths])
+    sizes = [num_episodes // processes + (i < num_episodes % processes) for i in range(processes)]
+    seeds = np.random.SeedSequence(seed).spawn(processes) if processes > 1 else [seed]
+    jobs = [(stacked, sizes[i], num_envs, seeds[i]) for i in range(processes)]
+
+    start = time.perf_counter()
+    if processes == 1:
+        results = [play(*jobs[0])]
+    else:
+        with mp.get_context('spawn').Pool(processes) as pool:
+            results = pool.starmap(play, jobs)
+    elapsed = time.perf_counter() - start
+
+    scores = np.concatenate([r[0] for r in results], axis=1)
+    lengths = np.concatenate([r[1] for r in results], axis=1)
+    means = scores.mean(axis=1)
+    best = int(np.argmax(means))
+
+    table = []
+    for k, path in enumerate(paths):
+        #The episodes are paired, so the difference with the best checkpoint has a tighter interval than the means
+        diff = scores[k] - scores[best]
+        table.append({'checkpoint': path,
+                      'score': summarize(scores[k]),
+                      'score_ci': Z*float(scores[k].std(ddof=1))/np.sqrt(num_episodes) if num_episodes > 1 else 0.0,
+                      'diff_vs_best': float(diff.mean()),
+                      'diff_vs_best_ci': Z*float(diff.std(ddof=1))/np.sqrt(num_episodes) if num_episodes > 1 else 0.0,
+                      'length': summarize(lengths[k])})
+    table.sort(key=lambda row: -row['score']['mean'])
+    for rank, row in enumerate(table, 1):
+        row['rank'] = rank
+        row['episodes'] = num_episodes
+        row['seed'] = seed
+        row['elapsed'] = elapsed
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play every checkpoint on the same episodes and rank them.')
+    parser.add_argument('checkpoints', nargs='*', help="Keras HDF5 files, snake.h5 and 'Rede Neural Trainner/*.h5' by default")
+    parser.add_argument('--episodes', type=int, default=NUM_EPISODES)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--envs', type=int, default=NUM_ENVS, help='games played at the same time by each checkpoint')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--json', action='store_true', help='print one JSON line per checkpoint instead of a table')
+    args = parser.parse_args()
+
+    paths = args.checkpoints or [p for p in ['snake.h5'] + sorted(glob.glob(os.path.join('Rede Neural Trainner', '*.h5'))) if os.path.exists(p)]
+    if not paths:
+        parser.error("no checkpoint given, and neither snake.h5 nor 'Rede Neural Trainner/*.h5' exist")
+    table = tournament(paths, args.episodes, args.processes, args.envs, args.seed)
+
+    if args.json:
+        for row in table:
+            print(json.dumps(row))
+    else:
+        width = max(len(row['checkpoint']) for row in table)
+        print('{:>4}  {:<{w}}  {:>16}  {:>6}  {:>16}'.format('rank', 'checkpoint', 'mean score', 'median', 'vs best', w=width))
+        for row in table:
+            print('{:>4}  {:<{w}}  {:>7.2f} +- {:<5.2f}  {:>6.1f}  {:>+7.2f} +- {:<5.2f}'.format(row['rank'], row['checkpoint'],
+                    row['score']['mean'], row['score_ci'], row['score']['median'], row['diff_vs_best'], row['diff_vs_best_ci'], w=width))
+        print('{} episodes per checkpoint in {:.1f} s'.format(args.episodes, table[0]['elapsed']))
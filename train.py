@@ -1,15 +1,21 @@
 import os
-import matplotlib.pyplot as plt
 import numpy as np
 
 from agent import DeepQ_agent
 from environment import Snake_Env
+from reporter import Reporter
+from profiler import Profiler
 from collections import deque
 
 
 fig_format = 'png'
 #fig_format = 'svg'
-RENDER = False      #if the Snake environment should be rendered
+RENDER = False      #if the Snake environment should be rendered, cv2 is only imported in that case
+SEED = None         #seed of the environment and the agent, for reproducible runs
+PROFILE = False     #time each phase of the loop and export the timers every PROFILE_EVERY seconds
+PROFILE_EVERY = 60
+PROFILE_JSON = 'dqn_training_profile.jsonl'     #one JSON line per export, None to disable
+PROFILE_PROMETHEUS = None                       #Prometheus text file, e.g. 'dqn_training.prom'
 
 
 #Creating the environment
@@ -17,7 +23,9 @@ max_env_width, max_env_height = 27, 27       # max size of the environment
 #env_width, env_height = 5, 5                 # initial size of the environment
 env_width, env_height = 25, 25                 # initial size of the environment
 display_width, display_height = 18 * max_env_width, 18 * max_env_height     # size of display
-env = Snake_Env(max_env_width, max_env_height, env_width, env_height, display_width, display_height)
+#Independent random streams for the environment and the agent
+env_seed, agent_seed = np.random.SeedSequence(SEED).spawn(2)
+env = Snake_Env(max_env_width, max_env_height, env_width, env_height, display_width, display_height, seed = env_seed)
 
 
 #Hyperparams
@@ -26,13 +34,21 @@ NETWORK_LR = 0.01   #0.01
 BATCH_SIZE = 64     #64
 UPDATE_EVERY = 5 #5
 GAMMA = 0.95
+PRIORITIZED = False     #prioritized experience replay
+MEMORY_CAPACITY = int(1e5)
+MEMORY_PATH = None      #directory to keep the replay memory on disk between sessions, e.g. 'replay'
+COMPACT_MEMORY = False  #store the states packed in 18 bytes
+TRAJECTORY_MEMORY = False   #store each observation once, in episode order
 epsilon, eps_min, eps_decay = 1.0, 0.05, 0.9996
 epsilon = 0.05
 NUM_EPISODES = 20000
 
 
 #Initialises the DQN agent
-agent = DeepQ_agent(env, hidden_units = HIDDEN_UNITS, network_LR = NETWORK_LR, batch_size = BATCH_SIZE, update_every = UPDATE_EVERY, gamma = GAMMA)
+profiler = Profiler(PROFILE, PROFILE_JSON, PROFILE_PROMETHEUS, PROFILE_EVERY)
+agent = DeepQ_agent(env, hidden_units = HIDDEN_UNITS, network_LR = NETWORK_LR, batch_size = BATCH_SIZE, update_every = UPDATE_EVERY, gamma = GAMMA, prioritized = PRIORITIZED,
+                    memory_capacity = MEMORY_CAPACITY, memory_path = MEMORY_PATH, compact_memory = COMPACT_MEMORY,
+                    trajectory_memory = TRAJECTORY_MEMORY, seed = agent_seed, profiler = profiler)
 
 
 if os.path.exists('snake.h5'):
@@ -44,16 +60,19 @@ else:
 
 
 INCREASE_EVERY, SAVE_EVERY = 500, 200 
-return_history = []
-score_history = []
+reporter = Reporter(fig_format=fig_format)     #saves and plots in the background, outside the episode loop
 
 
 for i in range(1, NUM_EPISODES+1):
 
     
     epsilon = max(epsilon*eps_decay, eps_min)
+    t = profiler.start()
     state = env.reset()
+    profiler.stop('env.reset', t)
+    t = profiler.start()
     action = agent.act(state, epsilon)
+    profiler.stop('agent.act', t)
 
     #Render the environment for visualization   
     if RENDER: 
@@ -63,11 +82,18 @@ for i in range(1, NUM_EPISODES+1):
 
     while True:
 
+        t = profiler.start()
         next_state, reward, done, info = env.step(action)
+        profiler.stop('env.step', t)
+        profiler.count('env_steps')
 
         #Add the experience to agent's memory
+        t = profiler.start()
         agent.add_experience(state, action, reward, next_state, done)
+        profiler.stop('agent.add_experience', t)
+        t = profiler.start()
         agent.learn()
+        profiler.stop('agent.learn', t)
 
         if RENDER:
             env.render(action)
@@ -77,27 +103,25 @@ for i in range(1, NUM_EPISODES+1):
         
         #Update state and action
         state = next_state
+        t = profiler.start()
         action = agent.act(state, epsilon)
+        profiler.stop('agent.act', t)
         cumulative_reward = agent.GAMMA * cumulative_reward + reward
 
-    return_history.append(cumulative_reward)
-    score_history.append(agent.env.SNAKE.LENGTH-4)
+    reporter.log({'episode': i, 'return': cumulative_reward, 'score': agent.env.SNAKE.LENGTH-4, 'epsilon': epsilon})
     print('iter: {}/{}, score: {}, cumulative reward: {:.3f}, eps: {:.3f}'.format(i, 
                                 NUM_EPISODES, agent.env.SNAKE.LENGTH - 4, cumulative_reward, epsilon)) 
 
 
+    profiler.count('episodes')
     if (i + 1)% SAVE_EVERY == 0:
-        agent.qnetwork_local.save('snake.h5')
-        plt.plot(return_history, 'tab:blue')
-        plt.xlabel('Episode')
-        plt.ylabel('Return')
-        plt.savefig('dqn_training_reward.' + fig_format, fig_format=fig_format)
-        
-        plt.figure()
-        plt.plot(score_history, 'tab:blue')
-        plt.xlabel('Episode')
-        plt.ylabel('Score')
-        plt.savefig('dqn_training_score.' + fig_format, fig_format=fig_format)
+        t = profiler.start()
+        reporter.checkpoint(agent.qnetwork_local.get_weights())
+        if MEMORY_PATH is not None:
+            reporter.flush(agent.memory)
+        reporter.report()
+        profiler.stop('save', t)
+    profiler.tick()
 
     
     #Increase environment size
@@ -110,4 +134,10 @@ for i in range(1, NUM_EPISODES+1):
         INCREASE_EVERY = 600
 
 #Save the agent's q-network weights for testing
-agent.qnetwork_local.save('snake.h5')
\ No newline at end of file
+reporter.checkpoint(agent.qnetwork_local.get_weights())
+if MEMORY_PATH is not None:
+    reporter.flush(agent.memory)
+
+#Waits for the checkpoint and the final plots to be written
+reporter.close()
+profiler.export()
@@ -0,0 +1,211 @@
+import os
+import time
+import queue
+import multiprocessing as mp
+import numpy as np
+
+from environment import Snake_Env
+
+
+#Creating the environment (same as train.py)
+max_env_width, max_env_height = 27, 27       # max size of the environment
+env_width, env_height = 25, 25               # initial size of the environment
+display_width, display_height = 18 * max_env_width, 18 * max_env_height     # size of display
+
+
+#Hyperparams
+HIDDEN_UNITS = (32, 18, 10)
+NETWORK_LR = 0.01
+BATCH_SIZE = 64
+UPDATE_EVERY = 5
+GAMMA = 0.95
+EPSILON = 0.05
+NUM_UPDATES = 200000
+SEED = None         #each actor and the learner get their own stream from this seed
+
+
+#Parallel settings
+NUM_ACTORS = 4              #actor processes playing the game
+WEIGHT_SYNC_EVERY = 50      #learner updates between two weight publications
+ACTOR_SYNC_EVERY = 200      #actor steps between two checks for new weights
+REPORT_EVERY = 10.0         #seconds between two throughput reports
+SAVE_EVERY = 5000           #learner updates between two checkpoints
+
+
+class SharedWeights:
+    """
+    Network weights published by the learner and read by the actors, in shared memory.
+    """
+    def __init__(self, ctx, weights):
+        """
+        Allocates the shared memory for the weights.
+
+        :param ctx: multiprocessing context.
+        :type ctx: multiprocessing context.
+        :param weights: initial weights of the network.
+        :type weights: list of NumPy arrays.
+        """
+        self.shapes = [w.shape for w in weights]
+        self.array = ctx.Array('f', sum(w.size for w in weights))   #synchronized with its own lock
+        self.version = ctx.Value('q', 0, lock=False)
+        self.push(weights)
+
+
+    def push(self, weights):
+        """
+        Publish new weights.
+
+        :param weights: weights of the network.
+        :type weights: list of NumPy arrays.
+        """
+        with self.array.get_lock():
+            np.frombuffer(self.array.get_obj(), dtype=np.float32)[:] = np.concatenate([w.ravel() for w in weights])
+            self.version.value += 1
+
+
+    def pull(self, version):
+        """
+        Read the weights if they are newer than the given version.
+
+        :param version: version of the weights already held.
+        :type version: int.
+        :return: weights (None if there is nothing new) and their version.
+        :rtype: list of NumPy arrays, int.
+        """
+        if self.version.value == version:
+            return None, version
+        with self.array.get_lock():
+            flat = np.frombuffer(self.array.get_obj(), dtype=np.float32).copy()
+            version = self.version.value
+        weights, start = [], 0
+        for shape in self.shapes:
+            size = int(np.prod(shape))
+            weights.append(flat[start:start+size].reshape(shape))
+            start += size
+        return weights, version
+
+
+def run_actor(actor_id, seed, weights, memory, scores, stop):
+    """
+    Plays the game with the latest published weights and writes the transitions to the shared memory.
+
+    :param actor_id: number of the actor.
+    :type actor_id: int.
+    :param seed: random stream of this actor.
+    :type seed: numpy.random.SeedSequence.
+    :param weights: weights published by the learner.
+    :type weights: SharedWeights.
+    :param memory: replay memory shared with the learner.
+    :type memory: SharedReplayMemory.
+    :param scores: queue with the score of every finished episode.
+    :type scores: multiprocessing.Queue.
+    :param stop: set by the learner when training is over.
+    :type stop: multiprocessing.Event.
+    """
+    from numpy_network import NumpyQNetwork
+
+    env_seed, policy_seed = seed.spawn(2)
+    env = Snake_Env(max_env_width, max_env_height, env_width, env_height, display_width, display_height, seed = env_seed)
+    network = NumpyQNetwork(env.STATE_SPACE, HIDDEN_UNITS, env.ACTION_SPACE)
+    memory.set_writer(actor_id)
+    rng = np.random.default_rng(policy_seed)
+    version, t = 0, 0
+
+    state = env.reset()
+    while not stop.is_set():
+        if t % ACTOR_SYNC_EVERY == 0:
+            new_weights, version = weights.pull(version)
+            if new_weights is not None:
+                network.set_weights(new_weights)
+
+        #Epsilon-greedy policy
+        if rng.random() > EPSILON:
+            action = int(np.argmax(network.predict_numpy(state)))
+        else:
+            action = int(rng.integers(env.ACTION_SPACE))
+        next_state, reward, done, _ = env.step(action)
+        memory.add(state, action, reward, next_state, done)
+        t += 1
+
+        if done:
+            scores.put(env.SNAKE.LENGTH - 4)
+            state = env.reset()
+        else:
+            state = next_state
+    memory.close()
+
+
+def main():
+    """
+    Trains the agent with NUM_ACTORS actor processes and one learner (this process).
+    """
+    from agent import DeepQ_agent
+    from memory import SharedReplayMemory
+
+    ctx = mp.get_context('spawn')
+    learner_seed, memory_seed, *actor_seeds = np.random.SeedSequence(SEED).spawn(NUM_ACTORS + 2)
+    env = Snake_Env(max_env_width, max_env_height, env_width, env_height, display_width, display_height)
+    agent = DeepQ_agent(env, hidden_units = HIDDEN_UNITS, network_LR = NETWORK_LR, batch_size = BATCH_SIZE, update_every = UPDATE_EVERY, gamma = GAMMA, seed = learner_seed)
+
+    if os.path.exists('snake.h5'):
+        print('Loading weights from previous learning session.')
+        agent.qnetwork_target.load('snake.h5')
+        agent.qnetwork_local.load('snake.h5')
+    else:
+        print('No weights found from previous learning session.')
+
+    #The actors write directly into the memory the agent samples from
+    agent.memory = SharedReplayMemory(agent.MEMORY_CAPACITY, agent.BATCH_SIZE, env.STATE_SPACE, NUM_ACTORS, np.random.default_rng(memory_seed))
+    weights = SharedWeights(ctx, agent.qnetwork_local.get_weights())
+    scores = ctx.Queue()
+    stop = ctx.Event()
+    actors = [ctx.Process(target=run_actor, args=(i, actor_seeds[i], weights, agent.memory, scores, stop), daemon=True) for i in range(NUM_ACTORS)]
+    for actor in actors:
+        actor.start()
+
+    updates, score_history = 0, []
+    start = last_report = time.perf_counter()
+    last_steps, last_updates = 0, 0
+    while updates < NUM_UPDATES:
+        while True:
+            try:
+                score_history.append(scores.get_nowait())
+            except queue.Empty:
+                break
+
+        if len(agent.memory) <= agent.BATCH_SIZE:   #wait for the actors to fill the memory
+            time.sleep(0.1)
+        else:
+            agent.learn()
+            updates += 1
+            if updates % WEIGHT_SYNC_EVERY == 0:
+                weights.push(agent.qnetwork_local.get_weights())
+            if updates % SAVE_EVERY == 0:
+                agent.qnetwork_local.save('snake.h5')
+
+        now = time.perf_counter()
+        if now - last_report >= REPORT_EVERY:
+            steps = int(agent.memory.added.sum())
+            print('updates: {}, env-steps/sec: {:.0f}, updates/sec: {:.1f}, mean score: {:.3f}'.format(updates,
+                        (steps - last_steps)/(now - last_report), (updates - last_updates)/(now - last_report),
+                        np.mean(score_history) if score_history else 0.0))
+            last_report, last_steps, last_updates, score_history = now, steps, updates, []
+
+    #Keep draining the queue so that the actors can exit
+    stop.set()
+    while any(actor.is_alive() for actor in actors):
+        try:
+            scores.get(timeout=0.1)
+        except queue.Empty:
+            pass
+
+    elapsed = time.perf_counter() - start
+    print('Total: {} env-steps/sec, {:.1f} updates/sec'.format(int(agent.memory.added.sum()/elapsed), updates/elapsed))
+
+    #Save the agent's q-network weights for testing
+    agent.qnetwork_local.save('snake.h5')
+    agent.memory.close()
+
+
+if __name__ == '__main__':
+    main()
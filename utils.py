@@ -1,5 +1,4 @@
 import numpy as np
-from PIL import Image
 
 #BGR
 GREEN = (0,255,0)
@@ -19,6 +18,8 @@ def add_info(width, height, env, action):
     :param action: action chose by the agent.
     :type action: int.
     """
+    from PIL import Image
+
     extra_cols = 10   #extra columns for the buttons. See display_action() below.
     rows, cols, channels = env.shape
     display_matrix = np.ones((rows, cols+extra_cols, channels), dtype=np.uint8)*255  #white background
@@ -0,0 +1,274 @@
+import numpy as np
+
+from environment import Snake_Env
+from snake import ray_tables
+
+
+#Directions indexed by velocity: 0:left, 1:right, 2:up, 3:down
+DIR_X = np.array([-1, 1, 0, 0])
+DIR_Y = np.array([0, 0, -1, 1])
+OPPOSITE = np.array([1, 0, 3, 2])
+
+
+
+class Snake_VecEnv(Snake_Env):
+    """
+    Represents N games of the environment played in lockstep.
+    """
+    def __init__(self, num_envs, max_width, max_height, init_width, init_height, display_width, display_height, seed=None, groups=None):
+        """
+        Vectorized environment params.
+
+        :param num_envs: number of games played at the same time.
+        :type num_envs: int.
+        :param max_width: maximum width of the game border.
+        :type max_width: int.
+        :param max_height: max height of the game border.
+        :type max_height: int.
+        :param init_width: initial with of the game border.
+        :type init_widht: int.
+        :param init_height: initial height of the game border.
+        :type init_height: int.
+        :param display_width: width of the display box.
+        :type display_width: int.
+        :param display_height: height of the display box.
+        :type display_height: int.
+        :param seed: seed of the random generator.
+        :type seed: int.
+        :param groups: group of each game, one generator for all the games if None. The games of a group take their
+                       episodes from one counter and episode e is seeded with (seed, e), so every group plays the same boards.
+        :type groups: NumPy int array with dimension (N,).
+        """
+        super().__init__(max_width, max_height, init_width, init_height, display_width, display_height, seed)
+        self.NUM_ENVS = num_envs
+        self.CAPACITY = 2*max_width*max_height      #max length of a snake body
+
+        n = num_envs
+        self.ENVS = np.arange(n)
+        self.BODY_X = np.zeros((n, self.CAPACITY), dtype=np.intp)     #ring buffers with the body of each snake
+        self.BODY_Y = np.zeros((n, self.CAPACITY), dtype=np.intp)
+        self.HEAD = np.zeros(n, dtype=np.intp)                        #index of the head in the ring buffer
+        self.LENGTH = np.zeros(n, dtype=np.intp)
+        self.MOVES = np.zeros(n, dtype=np.intp)
+        self.VELOCITY = np.zeros(n, dtype=np.intp)
+        self.FOOD_X = np.zeros(n, dtype=np.intp)
+        self.FOOD_Y = np.zeros(n, dtype=np.intp)
+        #Body segments on each cell. Each row of GRID is a flattened board plus two cells, always empty and always full (see ray_tables)
+        self.GRID = np.zeros((n, max_width*max_height+2), dtype=np.int16)
+        self.GRID[:, -1] = 1
+        self.OCCUPANCY = self.GRID[:, :-2].reshape(n, max_height, max_width)
+        self.STATE = np.zeros((n, self.STATE_SPACE))
+        self.FINAL_STATE = np.zeros((n, self.STATE_SPACE))   #last state of the finished games
+        self.FINAL_LENGTH = np.zeros(n, dtype=np.intp)       #length of the snakes of the finished games
+
+        #Counter-based random streams, one generator per episode
+        self.GROUPS = None if groups is None else np.asarray(groups)
+        self.SEED_SEQUENCE = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.NEXT_EPISODE = np.zeros(0 if groups is None else self.GROUPS.max()+1, dtype=np.int64)
+        self.EPISODE = np.zeros(n, dtype=np.int64)      #episode played by each game
+        self.RNGS = [None]*n
+
+
+    def integers(self, idx, low, high):
+        """
+        Draws one random integer for each of the given games.
+
+        :param idx: games.
+        :type idx: NumPy int array.
+        :param low: lowest value.
+        :type low: int.
+        :param high: one above the highest value.
+        :type high: int.
+        :rtype: NumPy int array with the dimension of idx.
+        """
+        if self.GROUPS is None:
+            return self.rng.integers(low, high, size=len(idx))
+        return np.array([self.RNGS[i].integers(low, high) for i in idx], dtype=np.intp)   #only a few games per step
+
+
+    def get_randoms(self, idx, length=4):
+        """
+        Returns random positions within the boundary for several games.
+
+        :param idx: games that need a position.
+        :type idx: NumPy int array.
+        :param length: length of the snake.
+        :type length: int.
+        """
+        x1, x2, y1, y2 = self.get_boundaries()
+
+        #Logic to keep the snake inside the boundary
+        if length>1:
+            max_w, max_h = self.MAX_WIDTH-length, self.MAX_HEIGHT-length
+            x1, x2 = max(x1, length-1), min(x2, max_w)
+            y1, y2 = max(y1, length-1), min(y2, max_h)
+        a = self.integers(idx, x1, x2+1)
+        b = self.integers(idx, y1, y2+1)
+        return a, b
+
+
+    def reset(self, mask=None):
+        """
+        Reset the games selected by mask. Initializes their snakes and foods.
+
+        :param mask: games to be reset, all of them if None.
+        :type mask: NumPy boolean array with dimension (N,).
+        :return: states of the environments.
+        :rtype: NumPy array with dimension (N, 18).
+        """
+        idx = self.ENVS if mask is None else np.flatnonzero(mask)
+        n = len(idx)
+        if n == 0:
+            return self.STATE
+
+        if self.GROUPS is not None:
+            entropy, key = self.SEED_SEQUENCE.entropy, self.SEED_SEQUENCE.spawn_key
+            for i in idx:
+                group = self.GROUPS[i]
+                self.EPISODE[i] = self.NEXT_EPISODE[group]
+                self.NEXT_EPISODE[group] += 1
+                self.RNGS[i] = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=key + (int(self.EPISODE[i]),)))
+
+        snake_x, snake_y = self.get_randoms(idx, length=4)
+        init_dir = OPPOSITE[self.integers(idx, 0, 4)]
+
+        self.OCCUPANCY[idx] = 0
+        for i in range(4):   #body grows backwards from the head
+            seg_x = snake_x - i*DIR_X[init_dir]
+            seg_y = snake_y - i*DIR_Y[init_dir]
+            self.BODY_X[idx, 3-i] = seg_x
+            self.BODY_Y[idx, 3-i] = seg_y
+            self.OCCUPANCY[idx, seg_y, seg_x] += 1
+
+        self.HEAD[idx] = 3
+        self.LENGTH[idx] = 4
+        self.MOVES[idx] = max(100, self.WIDTH*self.HEIGHT)
+        self.VELOCITY[idx] = init_dir
+        self.FOOD_X[idx], self.FOOD_Y[idx] = self.get_randoms(idx)
+        self.STATE[idx] = self.look(idx)
+
+        return self.STATE
+
+
+    def look(self, idx):
+        """
+        Look in all directions for the selected games. Same state as Snake.look.
+
+        :param idx: games to look from.
+        :type idx: NumPy int array.
+        :return: states of the selected games.
+        :rtype: NumPy array with dimension (len(idx), 18).
+        """
+        wall, rays, inverse = ray_tables(self.get_boundaries(), self.MAX_WIDTH, self.MAX_HEIGHT)
+        head = self.HEAD[idx]
+        head_x, head_y = self.BODY_X[idx, head], self.BODY_Y[idx, head]
+
+        #First body part along each ray
+        on_body = self.GRID[idx[:, None, None], rays[head_y, head_x]] > 0
+
+        state = np.empty((len(idx), self.STATE_SPACE))
+        state[:, 0] = head_x - self.FOOD_X[idx]
+        state[:, 1] = head_y - self.FOOD_Y[idx]
+        state[:, 2::2] = wall[head_y, head_x]
+        state[:, 3::2] = inverse[on_body.argmax(axis=2)]
+        return state
+
+
+    def render(self, action, index=0):
+        """
+        Render one of the games.
+
+        :param action: action chosen by the agent.
+        :type action: int.
+        :param index: game to be rendered.
+        :type index: int.
+        """
+        import cv2      #only needed to display the game
+        from renderer import Renderer
+
+        if self.RENDERER is None:
+            self.RENDERER = Renderer(self.MAX_WIDTH, self.MAX_HEIGHT, self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT)
+        head = self.HEAD[index]
+        img = self.RENDERER.draw(self.OCCUPANCY[index].ravel(), self.BODY_X[index, head], self.BODY_Y[index, head], True,
+                                    self.FOOD_X[index], self.FOOD_Y[index], self.get_boundaries(), action)
+        cv2.imshow("Snake Game", img)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):  #when Q is pressed
+            print('Stop Execution')
+            cv2.destroyAllWindows()
+            quit()
+
+
+    def step(self, actions):
+        """
+        Agents take actions and change the environments. Finished games are reset,
+        their last states and lengths are kept in FINAL_STATE and FINAL_LENGTH.
+
+        :param actions: actions chosen by the agent.
+        :type actions: NumPy int array with dimension (N,).
+        :return: states, rewards, dones and infos of the environments.
+        :rtype: NumPy arrays with dimension (N, 18), (N,), (N,), (N,).
+        """
+        envs = self.ENVS
+        actions = np.asarray(actions)
+        rewards = np.full(self.NUM_ENVS, -1.0)
+        infos = np.zeros(self.NUM_ENVS, dtype=np.intp)   #0:nothing, bite:1, eat:2, out_boundary:3, moves_done:4
+
+        #Moving backwards keeps the current direction
+        self.VELOCITY = np.where(self.VELOCITY == OPPOSITE[actions], self.VELOCITY, actions)
+        head = self.HEAD
+        new_head_x = self.BODY_X[envs, head] + DIR_X[self.VELOCITY]
+        new_head_y = self.BODY_Y[envs, head] + DIR_Y[self.VELOCITY]
+        cell_x = np.clip(new_head_x, 0, self.MAX_WIDTH-1)
+        cell_y = np.clip(new_head_y, 0, self.MAX_HEIGHT-1)
+
+        #Check if the snake bit itself (the last tail part is not considered)
+        tail = (head - self.LENGTH + 1) % self.CAPACITY
+        on_tail = (self.BODY_X[envs, tail] == new_head_x) & (self.BODY_Y[envs, tail] == new_head_y)
+        bite = (self.OCCUPANCY[envs, cell_y, cell_x] - on_tail > 0) & (self.LENGTH > 2)
+        rewards[bite] = -50
+        dones = bite.copy()
+        infos[bite] = 1
+
+        #Check if it ate food
+        eaten = (new_head_x == self.FOOD_X) & (new_head_y == self.FOOD_Y)
+        rewards[eaten] = 50
+        infos[eaten] = 2
+
+        #Check if the snake hit the wall
+        x1, x2, y1, y2 = self.get_boundaries()
+        out = (new_head_x < x1) | (new_head_x > x2) | (new_head_y < y1) | (new_head_y > y2)
+        rewards[out] = -50
+        dones |= out
+        infos[out] = 3
+
+        #Move the head forward, the tail only follows if no food was eaten
+        grow = eaten | ~dones
+        idx = envs[grow]
+        self.HEAD[idx] = (head[idx] + 1) % self.CAPACITY
+        self.BODY_X[idx, self.HEAD[idx]] = new_head_x[idx]
+        self.BODY_Y[idx, self.HEAD[idx]] = new_head_y[idx]
+        self.OCCUPANCY[idx, new_head_y[idx], new_head_x[idx]] += 1
+
+        moved = ~dones & ~eaten
+        idx = envs[moved]
+        self.OCCUPANCY[idx, self.BODY_Y[idx, tail[idx]], self.BODY_X[idx, tail[idx]]] -= 1
+        self.MOVES[idx] -= 1
+
+        idx = envs[eaten]
+        self.LENGTH[idx] += 1
+        self.MOVES[idx] += 100
+        self.FOOD_X[idx], self.FOOD_Y[idx] = self.get_randoms(idx)
+
+        out_of_moves = self.MOVES == 0   #Limit of moves reached
+        dones |= out_of_moves
+        infos[out_of_moves] = 4
+
+        self.STATE = self.look(envs)
+
+        #Keep the last state of the finished games and start new ones
+        self.FINAL_STATE[dones] = self.STATE[dones]
+        self.FINAL_LENGTH[dones] = self.LENGTH[dones]
+        self.reset(dones)
+
+        return self.STATE, rewards, dones, infos